@@ -14,6 +14,7 @@ class Artist extends Model
 
     protected $fillable = [
         'id',
+        'deezer_artist_id',
         'name',
         'image_url',
         'monthly_listeners',
@@ -0,0 +1,62 @@
+<?php
+
+namespace App\Models;
+
+use Illuminate\Database\Eloquent\Model;
+use LogicException;
+
+/**
+ * Precomputed album/artist mean vectors. The table is keyed on
+ * (seed_type, seed_id) and written only by scrapers/compute_neighbors.py.
+ */
+class SeedEmbedding extends Model
+{
+    protected $table = 'seed_embeddings';
+
+    public $incrementing = false;
+
+    protected $fillable = [
+        'seed_type',
+        'seed_id',
+        'embedding',
+        'track_count',
+    ];
+
+    protected $casts = [
+        'embedding' => 'array',
+        'track_count' => 'integer',
+    ];
+
+    /**
+     * The precomputed unit mean vector for an album or artist, if any.
+     *
+     * @return array<int, float>|null
+     */
+    public static function vectorFor(string $seedType, string $seedId): ?array
+    {
+        $embedding = static::where('seed_type', $seedType)
+            ->where('seed_id', $seedId)
+            ->first()
+            ?->embedding;
+
+        return is_array($embedding) && ! empty($embedding) ? $embedding : null;
+    }
+
+    /**
+     * Existing rows can't be updated through Eloquent: the key is composite
+     * and there is no id column, so the UPDATE would target `id = NULL`.
+     */
+    public function save(array $options = [])
+    {
+        if ($this->exists) {
+            throw new LogicException('seed_embeddings rows are rewritten by compute_neighbors.py, not updated in place.');
+        }
+
+        return parent::save($options);
+    }
+
+    public function delete()
+    {
+        throw new LogicException('seed_embeddings rows are rewritten by compute_neighbors.py, not deleted individually.');
+    }
+}
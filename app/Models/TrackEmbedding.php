@@ -2,11 +2,19 @@
 
 namespace App\Models;
 
+use Illuminate\Database\Eloquent\Casts\Attribute;
 use Illuminate\Database\Eloquent\Model;
 use Illuminate\Database\Eloquent\Relations\BelongsTo;
 
 class TrackEmbedding extends Model
 {
+    /** Binary layout version written by scrapers/compute_embeddings.py. */
+    public const BLOB_VERSION = 1;
+
+    public const BLOB_FLOAT32 = 1;
+
+    public const BLOB_FLOAT16 = 2;
+
     protected $table = 'track_embeddings';
 
     protected $primaryKey = 'track_id';
@@ -18,14 +26,78 @@ class TrackEmbedding extends Model
     protected $fillable = [
         'track_id',
         'embedding',
+        'embedding_blob',
     ];
 
-    protected $casts = [
-        'embedding' => 'array',
+    protected $hidden = [
+        'embedding_blob',
     ];
 
     public function track(): BelongsTo
     {
         return $this->belongsTo(Track::class);
     }
+
+    /**
+     * The vector as a list of floats, read from the binary column when present
+     * and from the JSON column otherwise.
+     */
+    protected function embedding(): Attribute
+    {
+        return Attribute::make(
+            get: function (?string $value, array $attributes): ?array {
+                $blob = $attributes['embedding_blob'] ?? null;
+                if (is_resource($blob)) {
+                    $blob = stream_get_contents($blob);
+                }
+                if (is_string($blob) && $blob !== '') {
+                    return self::decodeBlob($blob);
+                }
+
+                return $value === null ? null : json_decode($value, true);
+            },
+            set: fn (?array $value) => $value === null ? null : json_encode($value),
+        );
+    }
+
+    /**
+     * Decode "<version u8><dtype u8><dim u16>" followed by dim little-endian floats.
+     */
+    public static function decodeBlob(string $blob): ?array
+    {
+        if (strlen($blob) < 4) {
+            return null;
+        }
+
+        ['version' => $version, 'dtype' => $dtype, 'dim' => $dim] = unpack('Cversion/Cdtype/vdim', $blob);
+        if ($version !== self::BLOB_VERSION) {
+            return null;
+        }
+
+        if ($dtype === self::BLOB_FLOAT32 && strlen($blob) >= 4 + 4 * $dim) {
+            return $dim === 0 ? [] : array_values(unpack("g{$dim}", $blob, 4));
+        }
+
+        if ($dtype === self::BLOB_FLOAT16 && strlen($blob) >= 4 + 2 * $dim) {
+            return $dim === 0 ? [] : array_map(self::halfToFloat(...), array_values(unpack("v{$dim}", $blob, 4)));
+        }
+
+        return null;
+    }
+
+    private static function halfToFloat(int $half): float
+    {
+        $sign = ($half >> 15) ? -1.0 : 1.0;
+        $exponent = ($half >> 10) & 0x1F;
+        $fraction = $half & 0x3FF;
+
+        if ($exponent === 0) {
+            return $sign * $fraction * 2 ** -24;
+        }
+        if ($exponent === 0x1F) {
+            return $fraction ? NAN : $sign * INF;
+        }
+
+        return $sign * (1 + $fraction / 1024) * 2 ** ($exponent - 15);
+    }
 }
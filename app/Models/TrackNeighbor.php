@@ -0,0 +1,60 @@
+<?php
+
+namespace App\Models;
+
+use Illuminate\Database\Eloquent\Model;
+use Illuminate\Database\Eloquent\Relations\BelongsTo;
+use LogicException;
+
+/**
+ * Precomputed top-K neighbours per track. The table is keyed on
+ * (track_id, rank) and written only by scrapers/compute_neighbors.py.
+ */
+class TrackNeighbor extends Model
+{
+    protected $table = 'track_neighbors';
+
+    public $incrementing = false;
+
+    public $timestamps = false;
+
+    protected $fillable = [
+        'track_id',
+        'rank',
+        'neighbor_id',
+        'score',
+    ];
+
+    protected $casts = [
+        'rank' => 'integer',
+        'score' => 'float',
+    ];
+
+    public function track(): BelongsTo
+    {
+        return $this->belongsTo(Track::class);
+    }
+
+    public function neighbor(): BelongsTo
+    {
+        return $this->belongsTo(Track::class, 'neighbor_id');
+    }
+
+    /**
+     * Existing rows can't be updated through Eloquent: the key is composite
+     * and there is no id column, so the UPDATE would target `id = NULL`.
+     */
+    public function save(array $options = [])
+    {
+        if ($this->exists) {
+            throw new LogicException('track_neighbors rows are rewritten by compute_neighbors.py, not updated in place.');
+        }
+
+        return parent::save($options);
+    }
+
+    public function delete()
+    {
+        throw new LogicException('track_neighbors rows are rewritten by compute_neighbors.py, not deleted individually.');
+    }
+}
@@ -4,7 +4,9 @@
 
 use App\Models\Album;
 use App\Models\Artist;
+use App\Models\SeedEmbedding;
 use App\Models\Track;
+use App\Models\TrackNeighbor;
 use Illuminate\Support\Collection;
 
 class RecommendationService
@@ -39,11 +41,15 @@ public function recommend(RecommendationContext $ctx): Collection
         $seedCategory = $this->resolveSeedCategory($seed);
         $allowedGenres = $this->allowedGenres($seedCategory);
 
-        $pool = $this->buildCandidatePool($seed, array_filter($excluded), $ctx->limit);
+        $neighbours = $this->precomputedNeighbours($seed);
+        $pool = $this->buildCandidatePool($seed, array_filter($excluded), $ctx->limit, array_keys($neighbours));
 
-        $scored = $pool->map(function (Track $track) use ($seed, $ctx, $seedCategory) {
+        // Precomputed scores are the same cosine, but only for a single seed track.
+        $storedScores = $ctx->seedType === 'track' ? $neighbours : [];
+
+        $scored = $pool->map(function (Track $track) use ($seed, $ctx, $seedCategory, $storedScores) {
             $metaScore = $this->metadataScorer->score($track, $seed, $ctx->seedType, $seedCategory);
-            $embedScore = $this->embeddingScore($seed, $track);
+            $embedScore = $storedScores[$track->id] ?? $this->embeddingScore($seed, $track);
 
             return [
                 'track' => $track,
@@ -156,7 +162,10 @@ private function seedFromArtist(string $id): ?SeedProfile
         return new SeedProfile(artist: $artist, embedding: $embedding);
     }
 
-    private function buildCandidatePool(SeedProfile $seed, array $excluded, int $limit): Collection
+    /**
+     * @param  array<int, string>  $neighbourIds
+     */
+    private function buildCandidatePool(SeedProfile $seed, array $excluded, int $limit, array $neighbourIds = []): Collection
     {
         $baseQuery = fn () => Track::with(['artist', 'album', 'embedding'])
             ->whereNotNull('audio_url')
@@ -166,6 +175,12 @@ private function buildCandidatePool(SeedProfile $seed, array $excluded, int $lim
         $allowedGenres = $this->allowedGenres($seedCategory);
         $pool = collect();
 
+        // Tier 0: precomputed embedding neighbours
+        if (count($neighbourIds)) {
+            $tier0 = $baseQuery()->whereIn('id', $neighbourIds)->get();
+            $pool = $pool->merge($tier0);
+        }
+
         // Tier 1: same artist
         if ($seed->artistId()) {
             $tier1 = $baseQuery()
@@ -297,6 +312,33 @@ private function shouldFilterByCategory(?string $slug): bool
         return ! in_array(strtolower($slug), $this->genericCategories, true);
     }
 
+    /**
+     * Nearest neighbours of the seed from track_neighbors, best score first.
+     * Album and artist seeds use the neighbours of their own tracks.
+     *
+     * @return array<string, float>
+     */
+    private function precomputedNeighbours(SeedProfile $seed): array
+    {
+        $query = TrackNeighbor::query();
+        if ($seed->track) {
+            $query->where('track_id', $seed->track->id);
+        } elseif ($seed->album) {
+            $query->whereIn('track_id', Track::select('id')->where('album_id', $seed->album->id));
+        } elseif ($seed->artist) {
+            $query->whereIn('track_id', Track::select('id')->where('artist_id', $seed->artist->id));
+        } else {
+            return [];
+        }
+
+        $scores = [];
+        foreach ($query->orderByDesc('score')->limit(250)->get(['neighbor_id', 'score']) as $row) {
+            $scores[$row->neighbor_id] ??= (float) $row->score;
+        }
+
+        return $scores;
+    }
+
     private function embeddingScore(SeedProfile $seed, Track $candidate): ?float
     {
         $seedVec = $seed->embeddingVector();
@@ -327,12 +369,18 @@ private function embeddingScore(SeedProfile $seed, Track $candidate): ?float
     }
 
     /**
-     * Compute an album-level seed embedding as the mean of its track embeddings.
+     * Album-level seed embedding: the precomputed mean from seed_embeddings,
+     * else the mean of its track embeddings.
      *
      * @return array<int, float>|null
      */
     private function seedEmbeddingFromAlbum(string $albumId): ?array
     {
+        $stored = SeedEmbedding::vectorFor('album', $albumId);
+        if ($stored !== null) {
+            return $stored;
+        }
+
         $tracks = Track::with('embedding')
             ->where('album_id', $albumId)
             ->whereNotNull('audio_url')
@@ -343,12 +391,18 @@ private function seedEmbeddingFromAlbum(string $albumId): ?array
     }
 
     /**
-     * Compute an artist-level seed embedding as the mean of its track embeddings.
+     * Artist-level seed embedding: the precomputed mean from seed_embeddings,
+     * else the mean of its track embeddings.
      *
      * @return array<int, float>|null
      */
     private function seedEmbeddingFromArtist(string $artistId): ?array
     {
+        $stored = SeedEmbedding::vectorFor('artist', $artistId);
+        if ($stored !== null) {
+            return $stored;
+        }
+
         $tracks = Track::with('embedding')
             ->where('artist_id', $artistId)
             ->whereNotNull('audio_url')
@@ -0,0 +1,30 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    public function up(): void
+    {
+        Schema::table('track_embeddings', function (Blueprint $table) {
+            if (! Schema::hasColumn('track_embeddings', 'embedding_blob')) {
+                // Compact float32/float16 vectors written by scrapers/compute_embeddings.py --format.
+                $table->binary('embedding_blob')->nullable()->after('embedding');
+            }
+            // Rows written in a binary format may omit the JSON copy.
+            $table->json('embedding')->nullable()->change();
+        });
+    }
+
+    public function down(): void
+    {
+        Schema::table('track_embeddings', function (Blueprint $table) {
+            if (Schema::hasColumn('track_embeddings', 'embedding_blob')) {
+                $table->dropColumn('embedding_blob');
+            }
+        });
+        // embedding stays nullable: blob-only rows would otherwise block the rollback.
+    }
+};
@@ -0,0 +1,40 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    public function up(): void
+    {
+        // Filled by scrapers/compute_neighbors.py.
+        Schema::create('track_neighbors', function (Blueprint $table) {
+            $table->string('track_id');
+            $table->unsignedSmallInteger('rank');
+            $table->string('neighbor_id');
+            $table->float('score');
+
+            $table->primary(['track_id', 'rank']);
+
+            $table->foreign('track_id')->references('id')->on('tracks')->cascadeOnDelete();
+            $table->foreign('neighbor_id')->references('id')->on('tracks')->cascadeOnDelete();
+        });
+
+        Schema::create('seed_embeddings', function (Blueprint $table) {
+            $table->string('seed_type');
+            $table->string('seed_id');
+            $table->json('embedding');
+            $table->unsignedInteger('track_count')->default(0);
+            $table->timestamps();
+
+            $table->primary(['seed_type', 'seed_id']);
+        });
+    }
+
+    public function down(): void
+    {
+        Schema::dropIfExists('seed_embeddings');
+        Schema::dropIfExists('track_neighbors');
+    }
+};
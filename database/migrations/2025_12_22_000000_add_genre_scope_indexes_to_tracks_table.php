@@ -0,0 +1,36 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    /**
+     * Lets scrapers/genre_resolution.py --incremental find changed tracks and
+     * their album/artist groups without scanning the whole table.
+     */
+    private array $columns = ['updated_at', 'album_id', 'artist_id'];
+
+    public function up(): void
+    {
+        Schema::table('tracks', function (Blueprint $table) {
+            foreach ($this->columns as $column) {
+                if (! Schema::hasIndex('tracks', [$column])) {
+                    $table->index($column);
+                }
+            }
+        });
+    }
+
+    public function down(): void
+    {
+        Schema::table('tracks', function (Blueprint $table) {
+            foreach ($this->columns as $column) {
+                if (Schema::hasIndex('tracks', "tracks_{$column}_index")) {
+                    $table->dropIndex([$column]);
+                }
+            }
+        });
+    }
+};
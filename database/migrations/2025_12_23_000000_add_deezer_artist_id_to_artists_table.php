@@ -0,0 +1,27 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    public function up(): void
+    {
+        Schema::table('artists', function (Blueprint $table) {
+            if (! Schema::hasColumn('artists', 'deezer_artist_id')) {
+                $table->string('deezer_artist_id')->nullable()->unique()->after('id');
+            }
+        });
+    }
+
+    public function down(): void
+    {
+        Schema::table('artists', function (Blueprint $table) {
+            if (Schema::hasColumn('artists', 'deezer_artist_id')) {
+                $table->dropUnique(['deezer_artist_id']);
+                $table->dropColumn('deezer_artist_id');
+            }
+        });
+    }
+};
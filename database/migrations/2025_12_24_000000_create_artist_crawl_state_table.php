@@ -0,0 +1,23 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    public function up(): void
+    {
+        // Per-artist fingerprint for scrapers/ingest_deezer.py --incremental.
+        Schema::create('artist_crawl_state', function (Blueprint $table) {
+            $table->string('deezer_artist_id')->primary();
+            $table->string('fingerprint');
+            $table->double('crawled_at');
+        });
+    }
+
+    public function down(): void
+    {
+        Schema::dropIfExists('artist_crawl_state');
+    }
+};
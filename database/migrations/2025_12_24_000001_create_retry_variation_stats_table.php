@@ -0,0 +1,26 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    public function up(): void
+    {
+        // Search variation win counts for scrapers/retry_match_deezer.py.
+        Schema::create('retry_variation_stats', function (Blueprint $table) {
+            $table->string('title_kind');
+            $table->string('variation');
+            $table->unsignedInteger('attempts')->default(0);
+            $table->unsignedInteger('wins')->default(0);
+
+            $table->primary(['title_kind', 'variation']);
+        });
+    }
+
+    public function down(): void
+    {
+        Schema::dropIfExists('retry_variation_stats');
+    }
+};
@@ -0,0 +1,95 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\DB;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    public function up(): void
+    {
+        // Raw Deezer payloads stored by scrapers/ingest_deezer.py and searched
+        // by the matching scripts (scrapers/deezer_mirror.py).
+        Schema::create('deezer_mirror_artists', function (Blueprint $table) {
+            $table->unsignedBigInteger('id')->primary();
+            $table->string('name');
+            $table->longText('payload');
+            $table->double('fetched_at');
+        });
+
+        Schema::create('deezer_mirror_albums', function (Blueprint $table) {
+            $table->unsignedBigInteger('id')->primary();
+            $table->unsignedBigInteger('artist_id')->nullable();
+            $table->string('title');
+            $table->longText('payload');
+            $table->double('fetched_at');
+        });
+
+        Schema::create('deezer_mirror_tracks', function (Blueprint $table) {
+            $table->unsignedBigInteger('id')->primary();
+            $table->string('title');
+            $table->unsignedBigInteger('artist_id')->nullable();
+            $table->string('artist_name');
+            $table->unsignedBigInteger('album_id')->nullable();
+            $table->longText('payload');
+            $table->double('fetched_at');
+        });
+
+        if (DB::getDriverName() !== 'sqlite' || ! $this->sqliteHasFts5()) {
+            return;
+        }
+
+        // External-content FTS5 index over track title and artist name, kept in
+        // step with deezer_mirror_tracks by triggers.
+        DB::statement(<<<'SQL'
+            CREATE VIRTUAL TABLE deezer_mirror_tracks_fts USING fts5(
+                title, artist_name,
+                content='deezer_mirror_tracks', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+            SQL);
+        DB::statement(<<<'SQL'
+            CREATE TRIGGER deezer_mirror_tracks_ai AFTER INSERT ON deezer_mirror_tracks
+            BEGIN
+                INSERT INTO deezer_mirror_tracks_fts (rowid, title, artist_name)
+                VALUES (new.id, new.title, new.artist_name);
+            END
+            SQL);
+        DB::statement(<<<'SQL'
+            CREATE TRIGGER deezer_mirror_tracks_ad AFTER DELETE ON deezer_mirror_tracks
+            BEGIN
+                INSERT INTO deezer_mirror_tracks_fts (deezer_mirror_tracks_fts, rowid, title, artist_name)
+                VALUES ('delete', old.id, old.title, old.artist_name);
+            END
+            SQL);
+        DB::statement(<<<'SQL'
+            CREATE TRIGGER deezer_mirror_tracks_au AFTER UPDATE ON deezer_mirror_tracks
+            BEGIN
+                INSERT INTO deezer_mirror_tracks_fts (deezer_mirror_tracks_fts, rowid, title, artist_name)
+                VALUES ('delete', old.id, old.title, old.artist_name);
+                INSERT INTO deezer_mirror_tracks_fts (rowid, title, artist_name)
+                VALUES (new.id, new.title, new.artist_name);
+            END
+            SQL);
+    }
+
+    private function sqliteHasFts5(): bool
+    {
+        return (bool) DB::selectOne("SELECT sqlite_compileoption_used('ENABLE_FTS5') AS fts5")->fts5;
+    }
+
+    public function down(): void
+    {
+        if (DB::getDriverName() === 'sqlite') {
+            DB::statement('DROP TRIGGER IF EXISTS deezer_mirror_tracks_au');
+            DB::statement('DROP TRIGGER IF EXISTS deezer_mirror_tracks_ad');
+            DB::statement('DROP TRIGGER IF EXISTS deezer_mirror_tracks_ai');
+            DB::statement('DROP TABLE IF EXISTS deezer_mirror_tracks_fts');
+        }
+
+        Schema::dropIfExists('deezer_mirror_tracks');
+        Schema::dropIfExists('deezer_mirror_albums');
+        Schema::dropIfExists('deezer_mirror_artists');
+    }
+};
@@ -0,0 +1,29 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    public function up(): void
+    {
+        // Settings and signatures of the last scrapers/compute_embeddings.py run.
+        Schema::create('embedding_meta', function (Blueprint $table) {
+            $table->string('key')->primary();
+            $table->text('value');
+        });
+
+        // Per-track input digests for compute_embeddings.py --incremental.
+        Schema::create('embedding_fingerprints', function (Blueprint $table) {
+            $table->string('track_id')->primary();
+            $table->string('fingerprint');
+        });
+    }
+
+    public function down(): void
+    {
+        Schema::dropIfExists('embedding_fingerprints');
+        Schema::dropIfExists('embedding_meta');
+    }
+};
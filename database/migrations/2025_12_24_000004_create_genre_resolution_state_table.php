@@ -0,0 +1,24 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration
+{
+    public function up(): void
+    {
+        // updated_at watermark per mode for scrapers/genre_resolution.py --incremental.
+        Schema::create('genre_resolution_state', function (Blueprint $table) {
+            $table->string('mode')->primary();
+            $table->string('watermark')->nullable();
+            $table->text('settings');
+            $table->double('resolved_at');
+        });
+    }
+
+    public function down(): void
+    {
+        Schema::dropIfExists('genre_resolution_state');
+    }
+};
@@ -0,0 +1,29 @@
+"""
+Checks for the tables the scrapers share with the Laravel app.
+
+Their schema lives in database/migrations, so `migrate:fresh` resets scraper
+state together with the rows it describes. The scrapers only read and write
+these tables; the response cache and rate limiter keep their own SQLite files.
+"""
+from __future__ import annotations
+
+from typing import List
+
+
+def missing_tables(cur, *tables: str) -> List[str]:
+    missing = []
+    for table in tables:
+        # Works with a cursor or a connection: both return a cursor from execute().
+        found = cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE name=? AND type IN ('table', 'view')", (table,)
+        ).fetchone()
+        if found is None:
+            missing.append(table)
+    return missing
+
+
+def require_tables(cur, *tables: str):
+    missing = missing_tables(cur, *tables)
+    if missing:
+        what = f"Table {missing[0]} is" if len(missing) == 1 else f"Tables {', '.join(missing)} are"
+        raise SystemExit(f"{what} missing; run `php artisan migrate` first.")
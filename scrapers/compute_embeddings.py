@@ -2,48 +2,57 @@
 Lightweight embedding generator (no external ML deps).
 
 What it encodes:
-– Text surface: track name + artist + album + genre slug (hashed TF counts, fixed dim)
+– Text surface: track name + artist + album + genre slug (signed feature hashing
+  with blake2b, fixed dim, so vectors are identical across runs and machines)
 – Numeric: duration_z, year_z, popularity_z, optional bpm_z
 
 Genres are kept discrete for gating; this embedding focuses on similarity beyond crude tags.
 
-Stores unit-normalized vector in track_embeddings as JSON. Safe to rerun (upsert).
+Stores unit-normalized vector in track_embeddings as JSON, or with --format f32/f16
+as a compact little-endian BLOB in embedding_blob (4-byte header: version, dtype,
+dim). --keep-json writes both while JSON readers are being rolled over.
+Safe to rerun (upsert).
+
+--incremental only re-embeds tracks whose inputs changed: a fingerprint of
+name, artist, album, resolved slug and numeric features is kept per track, and
+the z-score stats (mean/std) of the last full build are reused so untouched
+vectors stay comparable. A full rebuild happens when those stats drift past
+--drift-threshold, the embedding settings change or --format changes.
+
+--stream bounds memory by --chunk-size instead of catalogue size: a first
+pass over the query accumulates mean/variance with Welford's method, a
+second pass embeds and upserts one chunk of rows at a time.
+
+Two engines produce the same vectors: "python" (plain lists, no deps) and
+"numpy", which tokenises into a COO matrix per chunk and does hashing,
+normalisation, weighting and z-scores as array operations. "auto" picks
+numpy when it is installed.
 """
 import argparse
+import hashlib
 import json
 import os
 import sqlite3
 import math
 import re
-from typing import List, Tuple, Optional
+import struct
+from functools import lru_cache
+from typing import Dict, Iterator, List, Tuple, Optional
 
+from app_schema import require_tables
+from genre_resolution import embedding_slug
 
-GENRE_ID_TO_SLUG = {
-    "132": "pop",
-    "116": "hip-hop",
-    "152": "metal",
-    "85": "rock",
-    "98": "folk-and-acoustic",
-    "173": "classical",
-    "169": "jazz",
-    "113": "dance-electronic",
-    "165": "soul",
-    "4642": "latin",
-    "75": "reggae",
-    "1324": "country",
-    "84": "punk",
-}
+WRITE_BATCH = 1000
+NUMPY_CHUNK = 10000
 
-GENERIC = {"unknown", "misc", "other", ""}
 
-
-def fetch_tracks(cur) -> Tuple[List[tuple], bool]:
+def track_query(cur) -> Tuple[str, bool]:
     cur.execute("PRAGMA table_info(tracks)")
     cols = [row[1] for row in cur.fetchall()]
     has_bpm = "bpm" in cols
     has_radio_key = "radio_genre_key" in cols
 
-    cur.execute(
+    return (
         f"""
         SELECT t.id,
                t.name,
@@ -58,15 +67,35 @@ def fetch_tracks(cur) -> Tuple[List[tuple], bool]:
                ar.monthly_listeners
                {', t.bpm' if has_bpm else ''}
         FROM tracks t
-        LEFT JOIN albums a ON a.id = t.album_id
-        LEFT JOIN artists ar ON ar.id = t.artist_id
+        -- album_id/artist_id are integer columns pointing at string keys; without
+        -- the casts SQLite compares numerically and cannot use the primary key index.
+        LEFT JOIN albums a ON a.id = CAST(t.album_id AS TEXT)
+        LEFT JOIN artists ar ON ar.id = CAST(t.artist_id AS TEXT)
         WHERE t.audio_url IS NOT NULL
-        """
+        """,
+        has_bpm,
     )
+
+
+def fetch_tracks(cur) -> Tuple[List[tuple], bool]:
+    sql, has_bpm = track_query(cur)
+    cur.execute(sql)
     rows = cur.fetchall()
     return rows, has_bpm
 
 
+def iter_track_chunks(conn, sql: str, size: int) -> Iterator[List[tuple]]:
+    """Stream the track query in chunks on its own cursor."""
+    cur = conn.cursor()
+    cur.execute(sql)
+    while True:
+        chunk = cur.fetchmany(size)
+        if not chunk:
+            break
+        yield chunk
+    cur.close()
+
+
 def to_float(value) -> float:
     if value is None:
         return 0.0
@@ -81,14 +110,12 @@ def to_float(value) -> float:
         return 0.0
 
 
-def zscore(values: List[float]) -> Tuple[dict, float, float]:
+def mean_std(values: List[float]) -> Tuple[float, float]:
     if not values:
-        return {}, 0.0, 1.0
+        return 0.0, 1.0
     mean = sum(values) / len(values)
     var = sum((v - mean) ** 2 for v in values) / max(1, len(values) - 1)
-    std = math.sqrt(var) or 1.0
-    normed = {i: (v - mean) / std for i, v in enumerate(values)}
-    return normed, mean, std
+    return mean, math.sqrt(var) or 1.0
 
 
 def year_from_date(date_str: Optional[str]) -> int:
@@ -112,114 +139,468 @@ def tokenize(text: str) -> List[str]:
     return TOKEN_RE.findall(text.lower())
 
 
+# Recorded in embedding_meta; bump whenever token hashing changes.
+HASH_SCHEME = "blake2b64-signed-v1"
+
+
+@lru_cache(maxsize=1 << 18)
+def token_bucket(tok: str, dim: int) -> Tuple[int, float]:
+    """Stable (bucket, sign) for a token: low bits pick the bucket, the top bit the sign."""
+    h = int.from_bytes(hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % dim, (-1.0 if h >> 63 else 1.0)
+
+
 def hash_tokens(tokens: List[str], dim: int) -> List[float]:
     vec = [0.0] * dim
     if dim <= 0:
         return vec
     for tok in tokens:
-        h = abs(hash(tok)) % dim
-        vec[h] += 1.0
+        bucket, sign = token_bucket(tok, dim)
+        vec[bucket] += sign
     return vec
 
 
-def resolve_slug(
-    radio_genre_key: Optional[str],
-    category_slug: Optional[str],
-    deezer_genre_id: Optional[str],
-    album_genre: Optional[str],
-) -> Optional[str]:
-    candidates = [radio_genre_key, category_slug, album_genre]
-    for cand in candidates:
-        if cand:
-            c = str(cand).strip().lower()
-            if c and c not in GENERIC:
-                return c
-    if deezer_genre_id:
-        return GENRE_ID_TO_SLUG.get(str(deezer_genre_id).strip(), None)
-    return None
+UPSERT_EMBEDDING_SQL = """
+    INSERT INTO track_embeddings (track_id, embedding, created_at, updated_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    ON CONFLICT(track_id) DO UPDATE SET embedding=excluded.embedding, updated_at=CURRENT_TIMESTAMP
+"""
 
 
-def upsert_embedding(cur, track_id: str, vector: List[float]):
-    cur.execute(
-        """
-        INSERT INTO track_embeddings (track_id, embedding, created_at, updated_at)
-        VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-        ON CONFLICT(track_id) DO UPDATE SET embedding=excluded.embedding, updated_at=CURRENT_TIMESTAMP
-        """,
-        (track_id, json.dumps(vector)),
-    )
+UPSERT_EMBEDDING_BLOB_SQL = """
+    INSERT INTO track_embeddings (track_id, embedding, embedding_blob, created_at, updated_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    ON CONFLICT(track_id) DO UPDATE SET
+        embedding=excluded.embedding, embedding_blob=excluded.embedding_blob,
+        updated_at=CURRENT_TIMESTAMP
+"""
 
+# Binary layout: <version u8><dtype u8><dim u16> followed by dim little-endian floats.
+BLOB_VERSION = 1
+BLOB_HEADER = struct.Struct("<BBH")
+BLOB_DTYPES = {"f32": (1, "f"), "f16": (2, "e")}
 
-def main():
-    parser = argparse.ArgumentParser(description="Compute improved embeddings (hashed text + numeric).")
-    parser.add_argument("--db", default=os.path.join(os.path.dirname(__file__), "..", "database", "database.sqlite"))
-    parser.add_argument("--text-dim", type=int, default=256, help="Hashed text dimension.")
-    parser.add_argument("--text-weight", type=float, default=1.0, help="Scalar to weight text block.")
-    parser.add_argument("--num-weight", type=float, default=0.3, help="Scalar to weight numeric block.")
-    args = parser.parse_args()
 
-    conn = sqlite3.connect(args.db)
-    cur = conn.cursor()
+def encode_embedding(vector: List[float], fmt: str) -> bytes:
+    dtype, code = BLOB_DTYPES[fmt]
+    return BLOB_HEADER.pack(BLOB_VERSION, dtype, len(vector)) + struct.pack(
+        f"<{len(vector)}{code}", *vector
+    )
 
-    rows, has_bpm = fetch_tracks(cur)
-    if not rows:
-        print("No tracks found.")
-        return
 
+def embedding_columns(cur) -> Tuple[bool, bool]:
+    """(has embedding_blob, JSON embedding column is NOT NULL)."""
+    cur.execute("PRAGMA table_info(track_embeddings)")
+    info = {row[1]: row for row in cur.fetchall()}
+    return "embedding_blob" in info, bool(info.get("embedding", (0, 0, 0, 0))[3])
+
+
+def write_embeddings(
+    cur,
+    items: Iterator[Tuple[str, List[float]]],
+    fmt: str = "json",
+    keep_json: bool = False,
+) -> int:
+    """Bulk upsert (track_id, vector) pairs; returns how many were written."""
+    blob_column, json_required = embedding_columns(cur)
+    if fmt != "json" and not blob_column:
+        raise SystemExit(
+            "track_embeddings.embedding_blob is missing; run `php artisan migrate` "
+            "or use --format json."
+        )
+    # Until the JSON column is nullable every row still needs its JSON copy.
+    keep_json = keep_json or json_required
+
+    def encode(track_id, vector):
+        if not blob_column:
+            return (track_id, json.dumps(vector))
+        if fmt == "json":
+            # Clear any old blob so readers don't prefer a stale vector.
+            return (track_id, json.dumps(vector), None)
+        return (
+            track_id,
+            json.dumps(vector) if keep_json else None,
+            encode_embedding(vector, fmt),
+        )
+
+    sql = UPSERT_EMBEDDING_BLOB_SQL if blob_column else UPSERT_EMBEDDING_SQL
+    written = 0
+    batch = []
+    for track_id, vector in items:
+        batch.append(encode(track_id, vector))
+        if len(batch) >= WRITE_BATCH:
+            cur.executemany(sql, batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        cur.executemany(sql, batch)
+        written += len(batch)
+    return written
+
+
+def text_tokens(row: tuple) -> List[str]:
     # Row shape (with radio_genre_key):
     # 0 id, 1 name, 2 duration, 3 category_slug, 4 deezer_genre_id, 5 radio_genre_key,
     # 6 album_name, 7 release_date, 8 album_genre, 9 artist_name, 10 monthly_listeners, (11 bpm?)
-    durations = [to_float(r[2]) for r in rows]
-    years = [year_from_date(r[7]) for r in rows]
-    popularity = [to_float(r[10]) for r in rows]
-    bpm_vals = [to_float(r[-1]) for r in rows] if has_bpm else None
+    track_name, category_slug, deezer_genre_id, radio_genre_key = row[1], row[3], row[4], row[5]
+    album_name, album_genre, artist_name = row[6], row[8], row[9]
+    slug = embedding_slug(radio_genre_key, category_slug, deezer_genre_id, album_genre) or "unknown"
+    return tokenize(" ".join(filter(None, [track_name, artist_name, album_name, slug])))
+
+
+FEATURE_NAMES = ["duration", "year", "popularity", "bpm"]
 
-    duration_z, _, _ = zscore(durations)
-    year_z, _, _ = zscore(years)
-    popularity_z, _, _ = zscore(popularity)
-    bpm_z = zscore(bpm_vals)[0] if bpm_vals is not None else None
+Stats = Dict[str, Tuple[float, float]]
 
+
+def numeric_features(row: tuple, has_bpm: bool) -> List[float]:
+    values = [to_float(row[2]), float(year_from_date(row[7])), to_float(row[10])]
+    if has_bpm:
+        values.append(to_float(row[-1]))
+    return values
+
+
+def feature_stats(rows: List[tuple], has_bpm: bool) -> Stats:
+    """(mean, std) per numeric feature over all rows."""
+    columns = list(zip(*(numeric_features(r, has_bpm) for r in rows)))
+    return {name: mean_std(list(values)) for name, values in zip(FEATURE_NAMES, columns)}
+
+
+class RunningStats:
+    """Welford's online mean/variance per numeric feature."""
+
+    def __init__(self, size: int):
+        self.n = 0
+        self.mean = [0.0] * size
+        self.m2 = [0.0] * size
+
+    def push(self, values: List[float]):
+        self.n += 1
+        for i, value in enumerate(values):
+            delta = value - self.mean[i]
+            self.mean[i] += delta / self.n
+            self.m2[i] += delta * (value - self.mean[i])
+
+    def stats(self) -> Stats:
+        if self.n == 0:
+            return {name: (0.0, 1.0) for name in FEATURE_NAMES[:len(self.mean)]}
+        return {
+            name: (mean, math.sqrt(m2 / max(1, self.n - 1)) or 1.0)
+            for name, mean, m2 in zip(FEATURE_NAMES, self.mean, self.m2)
+        }
+
+
+def embed_python(rows: List[tuple], has_bpm: bool, args, stats: Stats) -> Iterator[Tuple[str, List[float]]]:
+    moments = [stats[name] for name in FEATURE_NAMES[:4 if has_bpm else 3]]
     text_dim = max(0, args.text_dim)
-    for idx, row in enumerate(rows):
-        (
-            track_id,
-            track_name,
-            duration,
-            category_slug,
-            deezer_genre_id,
-            radio_genre_key,
-            album_name,
-            release_date,
-            album_genre,
-            artist_name,
-            monthly_listeners,
-            *rest,
-        ) = row
-
-        slug = resolve_slug(radio_genre_key, category_slug, deezer_genre_id, album_genre) or "unknown"
-        tokens = tokenize(" ".join(filter(None, [track_name, artist_name, album_name, slug])))
-        text_vec = hash_tokens(tokens, text_dim)
+    for row in rows:
+        text_vec = hash_tokens(text_tokens(row), text_dim)
 
         # normalize text block then weight
         text_vec = normalize(text_vec)
         text_vec = [v * args.text_weight for v in text_vec]
 
         num_vec = [
-            duration_z.get(idx, 0.0),
-            year_z.get(idx, 0.0),
-            popularity_z.get(idx, 0.0),
+            (value - mean) / std * args.num_weight
+            for value, (mean, std) in zip(numeric_features(row, has_bpm), moments)
         ]
-        if bpm_z is not None:
-            num_vec.append(bpm_z.get(idx, 0.0))
-        num_vec = [v * args.num_weight for v in num_vec]
 
         full_vec = text_vec + num_vec
-        full_vec = normalize(full_vec)
+        yield row[0], normalize(full_vec)
 
-        upsert_embedding(cur, track_id, full_vec)
+
+def normalize_rows(np, block):
+    norms = np.sqrt((block * block).sum(axis=1, keepdims=True))
+    norms[norms == 0] = 1.0
+    return block / norms
+
+
+def embed_numpy(rows: List[tuple], has_bpm: bool, args, stats: Stats) -> Iterator[Tuple[str, List[float]]]:
+    import numpy as np
+
+    names = FEATURE_NAMES[:4 if has_bpm else 3]
+    means = np.array([stats[name][0] for name in names])
+    stds = np.array([stats[name][1] for name in names])
+    features = np.array([numeric_features(r, has_bpm) for r in rows], dtype=np.float64)
+    numeric = (features.reshape(len(rows), len(names)) - means) / stds * args.num_weight
+
+    text_dim = max(0, args.text_dim)
+    for start in range(0, len(rows), NUMPY_CHUNK):
+        chunk = rows[start:start + NUMPY_CHUNK]
+        if text_dim > 0:
+            # COO entries (row, bucket, sign); bincount sums duplicates.
+            coo_rows, coo_cols, coo_signs = [], [], []
+            for i, row in enumerate(chunk):
+                for tok in text_tokens(row):
+                    bucket, sign = token_bucket(tok, text_dim)
+                    coo_rows.append(i)
+                    coo_cols.append(bucket)
+                    coo_signs.append(sign)
+            flat = np.asarray(coo_rows, dtype=np.int64) * text_dim + np.asarray(coo_cols, dtype=np.int64)
+            text = np.bincount(flat, weights=coo_signs, minlength=len(chunk) * text_dim)
+            text = normalize_rows(np, text.reshape(len(chunk), text_dim)) * args.text_weight
+        else:
+            text = np.zeros((len(chunk), 0))
+        full = normalize_rows(np, np.hstack([text, numeric[start:start + len(chunk)]]))
+        for row, vector in zip(chunk, full.tolist()):
+            yield row[0], vector
+
+
+def require_meta_table(cur):
+    require_tables(cur, "embedding_meta")
+
+
+def read_meta(cur) -> Dict[str, str]:
+    require_meta_table(cur)
+    cur.execute("SELECT key, value FROM embedding_meta")
+    return dict(cur.fetchall())
+
+
+def write_meta(cur, values: Dict[str, object]):
+    require_meta_table(cur)
+    cur.executemany(
+        "INSERT INTO embedding_meta (key, value) VALUES (?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+        [(key, str(value)) for key, value in values.items()],
+    )
+
+
+def fingerprint(row: tuple, has_bpm: bool) -> str:
+    """Digest of every input that feeds a track's vector (text, slug, raw numerics)."""
+    payload = json.dumps([text_tokens(row), numeric_features(row, has_bpm)], separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def require_fingerprint_table(cur):
+    require_tables(cur, "embedding_fingerprints")
+
+
+def stored_fingerprints(cur, track_ids: List[str]) -> Dict[str, str]:
+    """Fingerprints of tracks that also still have an embedding row."""
+    stored = {}
+    for start in range(0, len(track_ids), 900):
+        ids = track_ids[start:start + 900]
+        cur.execute(
+            f"""
+            SELECT f.track_id, f.fingerprint FROM embedding_fingerprints f
+            JOIN track_embeddings e ON e.track_id = f.track_id
+            WHERE f.track_id IN ({",".join("?" * len(ids))})
+            """,
+            ids,
+        )
+        stored.update(cur.fetchall())
+    return stored
+
+
+def stats_drift(old: Stats, new: Stats) -> float:
+    """Largest shift of a mean (in old stds) or relative change of a std."""
+    drift = 0.0
+    for name, (mean, std) in new.items():
+        if name not in old:
+            return math.inf
+        old_mean, old_std = old[name]
+        drift = max(drift, abs(mean - old_mean) / old_std, abs(std / old_std - 1.0))
+    return drift
+
+
+def rebuild_reason(
+    previous: Dict[str, str],
+    space: Dict[str, object],
+    stats: Stats,
+    threshold: float,
+    fmt: str,
+    keep_json: bool = False,
+) -> Optional[str]:
+    """Why an incremental run has to re-embed everything, or None if it doesn't."""
+    for key, value in space.items():
+        if previous.get(key) != str(value):
+            return f"{key} changed ({previous.get(key)} -> {value})"
+    # Unchanged rows keep their old storage, so a new format means rewriting them all.
+    if previous.get("format", "json") != fmt:
+        return f"format changed ({previous.get('format', 'json')} -> {fmt})"
+    if fmt != "json" and keep_json and previous.get("keep_json") != "1":
+        return "--keep-json added"
+    if "norm_stats" not in previous:
+        return "no stored normalisation stats"
+    drift = stats_drift(json.loads(previous["norm_stats"]), stats)
+    if drift > threshold:
+        return f"normalisation stats drifted by {drift:.3f} (threshold {threshold})"
+    return None
+
+
+def embedding_space(args, has_bpm: bool) -> Dict[str, object]:
+    """Settings that define the embedding space; vectors are only comparable if all match."""
+    return {
+        "hash_scheme": HASH_SCHEME,
+        "text_dim": max(0, args.text_dim),
+        "num_dim": 4 if has_bpm else 3,
+        "text_weight": args.text_weight,
+        "num_weight": args.num_weight,
+    }
+
+
+# Derived from the vectors by compute_neighbors.py; the app prefers them over live vectors.
+PRECOMPUTED_TABLES = ("track_neighbors", "seed_embeddings")
+
+
+def clear_precomputed(cur) -> List[str]:
+    """Empty the precomputed neighbour/seed tables so they never outlive a rebuilt space."""
+    cleared = []
+    for table in PRECOMPUTED_TABLES:
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
+        if cur.fetchone() is not None:
+            cur.execute(f"DELETE FROM {table}")
+            cleared.append(table)
+    if cleared:
+        # Make compute_neighbors.py rebuild even if the embedding signature looks unchanged.
+        require_meta_table(cur)
+        cur.execute("DELETE FROM embedding_meta WHERE key='neighbors_signature'")
+    return cleared
+
+
+def numpy_available() -> bool:
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute improved embeddings (hashed text + numeric).")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(__file__), "..", "database", "database.sqlite"))
+    parser.add_argument("--text-dim", type=int, default=256, help="Hashed text dimension.")
+    parser.add_argument("--text-weight", type=float, default=1.0, help="Scalar to weight text block.")
+    parser.add_argument("--num-weight", type=float, default=0.3, help="Scalar to weight numeric block.")
+    parser.add_argument(
+        "--engine",
+        choices=["auto", "python", "numpy"],
+        default="auto",
+        help="Vectorise with NumPy (auto = when installed) or plain Python lists.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "f32", "f16"],
+        default="json",
+        help="Storage format: JSON text or a float32/float16 BLOB in embedding_blob.",
+    )
+    parser.add_argument(
+        "--keep-json",
+        action="store_true",
+        help="With --format f32/f16, also write the JSON column for readers not yet migrated.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-embed new or changed tracks, reusing the stored normalisation stats.",
+    )
+    parser.add_argument(
+        "--drift-threshold",
+        type=float,
+        default=0.05,
+        help="With --incremental, rebuild everything once a feature mean moves by this many "
+        "stds or a std changes by this fraction.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Two passes over the query (Welford stats, then chunked writes) to bound memory.",
+    )
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per chunk with --stream.")
+    parser.add_argument(
+        "--build-index",
+        action="store_true",
+        help="Refresh the nearest-neighbour index (embedding_index.py, needs numpy) afterwards.",
+    )
+    args = parser.parse_args()
+
+    engine = args.engine
+    if engine == "auto":
+        engine = "numpy" if numpy_available() else "python"
+    elif engine == "numpy" and not numpy_available():
+        parser.error("--engine numpy requires numpy (pip install numpy)")
+
+    conn = sqlite3.connect(args.db)
+    cur = conn.cursor()
+    # Fail before the feature passes rather than after them.
+    require_meta_table(cur)
+    require_fingerprint_table(cur)
+
+    if args.stream:
+        sql, has_bpm = track_query(cur)
+        running = RunningStats(4 if has_bpm else 3)
+        for chunk in iter_track_chunks(conn, sql, args.chunk_size):
+            for row in chunk:
+                running.push(numeric_features(row, has_bpm))
+        total = running.n
+        stats = running.stats()
+        chunks = iter_track_chunks(conn, sql, args.chunk_size)
+    else:
+        rows, has_bpm = fetch_tracks(cur)
+        total = len(rows)
+        stats = feature_stats(rows, has_bpm)
+        chunks = [rows]
+    if not total:
+        print("No tracks found.")
+        return
+
+    space = embedding_space(args, has_bpm)
+    previous = read_meta(cur)
+    if previous.get("hash_scheme") and previous.get("hash_scheme") != HASH_SCHEME:
+        print(f"Hash scheme changed ({previous['hash_scheme']} -> {HASH_SCHEME}); rewriting all embeddings.")
+
+    require_fingerprint_table(cur)
+    full_build = True
+    if args.incremental:
+        reason = rebuild_reason(
+            previous, space, stats, args.drift_threshold, args.format, args.keep_json
+        )
+        if reason:
+            print(f"Full rebuild: {reason}")
+        else:
+            full_build = False
+            stats = {name: tuple(v) for name, v in json.loads(previous["norm_stats"]).items()}
+
+    embed = embed_numpy if engine == "numpy" else embed_python
+    written = 0
+    for chunk in chunks:
+        fingerprints = {row[0]: fingerprint(row, has_bpm) for row in chunk}
+        todo = chunk
+        if not full_build:
+            stored = stored_fingerprints(cur, list(fingerprints))
+            todo = [row for row in chunk if stored.get(row[0]) != fingerprints[row[0]]]
+        if not todo:
+            continue
+        written += write_embeddings(cur, embed(todo, has_bpm, args, stats), args.format, args.keep_json)
+        cur.executemany(
+            "INSERT INTO embedding_fingerprints (track_id, fingerprint) VALUES (?, ?) "
+            "ON CONFLICT(track_id) DO UPDATE SET fingerprint=excluded.fingerprint",
+            [(row[0], fingerprints[row[0]]) for row in todo],
+        )
+    if not full_build:
+        print(f"Incremental: {written} of {total} tracks new or changed.")
+
+    if full_build:
+        cur.execute("DELETE FROM embedding_fingerprints WHERE track_id NOT IN (SELECT id FROM tracks)")
+        cleared = clear_precomputed(cur)
+        if cleared:
+            print(f"Cleared {', '.join(cleared)}; run compute_neighbors.py to rebuild them.")
+    meta = {**space, "format": args.format, "keep_json": "1" if args.keep_json else "0"}
+    if full_build:
+        # Incremental runs keep the stats of the last full build so old vectors stay valid.
+        meta["norm_stats"] = json.dumps(stats)
+    write_meta(cur, meta)
 
     conn.commit()
-    print(f"Wrote embeddings for {len(rows)} tracks. dim={text_dim}+{len(num_vec)}")
+    conn.close()
+    print(f"Wrote embeddings for {written} tracks. dim={space['text_dim']}+{space['num_dim']} engine={engine} format={args.format} hash={HASH_SCHEME}")
+
+    if args.build_index:
+        from embedding_index import build_index, default_index_path
+
+        index_path = default_index_path(args.db)
+        index = build_index(args.db, index_path)
+        print(f"Index is up to date: {index_path}" if index is None else f"Indexed {len(index.ids)} tracks -> {index_path}")
 
 
 if __name__ == "__main__":
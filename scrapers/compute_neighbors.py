@@ -0,0 +1,187 @@
+"""
+Materialise nearest neighbours and seed vectors from track_embeddings.
+
+Fills two tables the Laravel recommenders read directly:
+– track_neighbors: the top-K most similar tracks per track (exact cosine),
+  computed with blocked matrix multiplication so memory stays bounded by the
+  block sizes rather than n².
+– seed_embeddings: the unit-normalised mean vector per album and per artist,
+  so album/artist radio seeds no longer average track embeddings per request.
+
+Skipped when track_embeddings has not changed since the last run (same
+signature as embedding_index.py), unless --force is given. A full
+compute_embeddings.py run empties both tables, so the app falls back to live
+vectors until this script has been rerun against the new embedding space.
+
+    python compute_neighbors.py [--db PATH] [-k 50] [--force]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import time
+from typing import Iterator, Tuple
+
+import numpy as np
+
+from compute_embeddings import read_meta, write_meta
+from embedding_index import DEFAULT_DB, embedding_signature, load_embeddings
+
+ROW_BLOCK = 512
+COL_BLOCK = 16384
+WRITE_BATCH = 5000
+
+
+def top_k_neighbors(
+    vectors: np.ndarray, k: int, row_block: int = ROW_BLOCK, col_block: int = COL_BLOCK
+) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """Yield (first row, neighbour indices, scores) per row block, best first, self excluded."""
+    n = len(vectors)
+    k = min(k, n - 1)
+    if k < 1:
+        raise ValueError("top_k_neighbors needs k >= 1 and at least two vectors")
+    for start in range(0, n, row_block):
+        rows = vectors[start:start + row_block]
+        b = len(rows)
+        best_scores = np.full((b, k), -np.inf, dtype=np.float32)
+        best_idx = np.full((b, k), -1, dtype=np.int64)
+        for col_start in range(0, n, col_block):
+            scores = rows @ vectors[col_start:col_start + col_block].T
+            width = scores.shape[1]
+            # Mask each row's own column when it falls inside this block.
+            local = np.arange(b)
+            own = start + local - col_start
+            inside = (own >= 0) & (own < width)
+            scores[local[inside], own[inside]] = -np.inf
+
+            # Cut the block down to its own top-k before merging with the running best.
+            if width > k:
+                block_idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, block_idx, axis=1)
+            else:
+                block_idx = np.broadcast_to(np.arange(width), (b, width))
+            cand_scores = np.hstack([best_scores, scores])
+            cand_idx = np.hstack([best_idx, block_idx + col_start])
+            keep = np.argpartition(-cand_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(cand_scores, keep, axis=1)
+            best_idx = np.take_along_axis(cand_idx, keep, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        yield start, np.take_along_axis(best_idx, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def group_means(keys: np.ndarray, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(unique keys, unit mean vector per key, track count per key)."""
+    unique, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    order = np.argsort(inverse, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    sums = np.add.reduceat(vectors[order].astype(np.float64), starts, axis=0)
+    norms = np.linalg.norm(sums, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return unique, (sums / norms).astype(np.float32), counts
+
+
+def write_neighbors(cur, ids: np.ndarray, vectors: np.ndarray, k: int) -> int:
+    cur.execute("DELETE FROM track_neighbors")
+    written = 0
+    batch = []
+    for start, idx, scores in top_k_neighbors(vectors, k):
+        for offset in range(len(idx)):
+            track_id = str(ids[start + offset])
+            for rank, (neighbor, score) in enumerate(zip(idx[offset], scores[offset]), 1):
+                if neighbor < 0:
+                    break
+                batch.append((track_id, str(ids[neighbor]), rank, float(score)))
+        if len(batch) >= WRITE_BATCH:
+            cur.executemany(
+                "INSERT INTO track_neighbors (track_id, neighbor_id, rank, score) VALUES (?, ?, ?, ?)",
+                batch,
+            )
+            written += len(batch)
+            batch = []
+    if batch:
+        cur.executemany(
+            "INSERT INTO track_neighbors (track_id, neighbor_id, rank, score) VALUES (?, ?, ?, ?)",
+            batch,
+        )
+        written += len(batch)
+    return written
+
+
+def write_seed_embeddings(cur, ids: np.ndarray, vectors: np.ndarray) -> int:
+    positions = {str(track_id): i for i, track_id in enumerate(ids)}
+    cur.execute("SELECT id, album_id, artist_id FROM tracks")
+    album_keys, artist_keys, album_rows, artist_rows = [], [], [], []
+    for track_id, album_id, artist_id in cur.fetchall():
+        pos = positions.get(str(track_id))
+        if pos is None:
+            continue
+        if album_id is not None:
+            album_keys.append(str(album_id))
+            album_rows.append(pos)
+        if artist_id is not None:
+            artist_keys.append(str(artist_id))
+            artist_rows.append(pos)
+
+    cur.execute("DELETE FROM seed_embeddings")
+    written = 0
+    for seed_type, keys, rows in (("album", album_keys, album_rows), ("artist", artist_keys, artist_rows)):
+        if not keys:
+            continue
+        unique, means, counts = group_means(np.asarray(keys), vectors[rows])
+        cur.executemany(
+            """
+            INSERT INTO seed_embeddings (seed_type, seed_id, embedding, track_count, created_at, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            """,
+            [
+                (seed_type, str(key), json.dumps(mean.tolist()), int(count))
+                for key, mean, count in zip(unique, means, counts)
+            ],
+        )
+        written += len(unique)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute track neighbours and album/artist seed vectors.")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("-k", type=int, default=50, help="Neighbours stored per track.")
+    parser.add_argument("--force", action="store_true", help="Recompute even if embeddings are unchanged.")
+    args = parser.parse_args()
+    if args.k < 1:
+        parser.error("-k must be at least 1")
+
+    conn = sqlite3.connect(args.db)
+    cur = conn.cursor()
+    for table in ("track_neighbors", "seed_embeddings"):
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
+        if cur.fetchone() is None:
+            raise SystemExit(f"Table {table} is missing; run `php artisan migrate` first.")
+
+    signature = embedding_signature(conn)
+    if not args.force and read_meta(cur).get("neighbors_signature") == signature:
+        print("Neighbours are up to date.")
+        conn.close()
+        return
+
+    start = time.time()
+    ids, _, vectors = load_embeddings(conn)
+    if len(ids) < 2:
+        print("Not enough embeddings found.")
+        conn.close()
+        return
+
+    neighbors = write_neighbors(cur, ids, vectors, args.k)
+    seeds = write_seed_embeddings(cur, ids, vectors)
+    write_meta(cur, {"neighbors_signature": signature})
+    conn.commit()
+    conn.close()
+    print(
+        f"Wrote {neighbors} neighbours for {len(ids)} tracks and {seeds} seed vectors "
+        f"in {time.time() - start:.1f}s."
+    )
+
+
+if __name__ == "__main__":
+    main()
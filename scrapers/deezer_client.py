@@ -0,0 +1,207 @@
+"""
+Shared Deezer API client for the scrapers.
+
+AsyncDeezerClient keeps one pooled connection set open (HTTP/2 when the `h2`
+package is installed), caps the number of in-flight requests, and retries
+429/5xx responses with the same exponential backoff the old requests-based
+make_session() used. When given a RateLimiter it takes a token before every
+request and reports 429s and quota payloads back to it. With a ResponseCache,
+fresh cached responses are served from disk without touching the network or
+the limiter; cache reads and writes run in worker threads so SQLite I/O never
+blocks the event loop. Non-JSON bodies (proxy error pages and the like) are
+retried like 5xx responses. DeezerClient wraps it in a blocking facade: the
+event loop runs on a background thread, so plain scripts and worker threads
+can call get() as before, or get_many() to pipeline a batch of requests.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+BASE_URL = "https://api.deezer.com"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+QUOTA_ERROR_CODE = 4
+
+Request = Tuple[str, Optional[Dict]]
+
+
+def is_error_payload(payload: Any) -> bool:
+    return isinstance(payload, dict) and "error" in payload
+
+
+def is_quota_error(payload: Any) -> bool:
+    """Deezer reports an exhausted quota as HTTP 200 with error code 4."""
+    if not isinstance(payload, dict):
+        return False
+    error = payload.get("error")
+    return isinstance(error, dict) and error.get("code") == QUOTA_ERROR_CODE
+
+
+class DeezerAPIError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class AsyncDeezerClient:
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        max_concurrency: int = 16,
+        retries: int = 5,
+        backoff_factor: float = 1.0,
+        timeout: float = 20.0,
+        limiter: Optional[RateLimiter] = None,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max(1, max_concurrency)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.limiter = limiter
+        self.cache = cache
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        # Created lazily so both belong to the loop that actually runs the requests.
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    @staticmethod
+    def _retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+        if response is None:
+            return None
+        try:
+            return max(0.0, float(response.headers.get("Retry-After", "")))
+        except ValueError:
+            return None
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        retry_after = self._retry_after(response)
+        if retry_after is not None:
+            return retry_after
+        return self.backoff_factor * (2 ** attempt)
+
+    async def get(self, path: str, params: Optional[Dict] = None, refresh: bool = False) -> Any:
+        """Fetch path; refresh=True skips the cached copy but still stores the result."""
+        if self.cache is not None and not refresh:
+            cached = await asyncio.to_thread(self.cache.get, path, params)
+            if cached is not None:
+                return cached
+        client = self._ensure_client()
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                await asyncio.sleep(await asyncio.to_thread(self.limiter.reserve))
+            async with self._semaphore:
+                try:
+                    resp = await client.get(url, params=params or {})
+                except httpx.TransportError as e:
+                    if attempt >= self.retries:
+                        raise DeezerAPIError(f"Request to {path} failed: {e}") from e
+                    resp = None
+
+            quota_exceeded = invalid_body = False
+            if resp is not None and not resp.is_error:
+                try:
+                    payload = resp.json()
+                except ValueError:
+                    invalid_body = True
+                else:
+                    quota_exceeded = is_quota_error(payload)
+                if not quota_exceeded and not invalid_body:
+                    if self.cache is not None and not is_error_payload(payload):
+                        await asyncio.to_thread(self.cache.put, path, params, payload)
+                    return payload
+            elif resp is not None and resp.status_code not in RETRY_STATUSES:
+                raise DeezerAPIError(
+                    f"API error {resp.status_code} for {path}", resp.status_code
+                )
+
+            # Retryable from here on: transport error, 429/5xx, a quota payload or a non-JSON body.
+            throttled = quota_exceeded or (resp is not None and resp.status_code == 429)
+            if self.limiter is not None and throttled:
+                await asyncio.to_thread(self.limiter.penalize, self._retry_after(resp))
+            if attempt >= self.retries:
+                if quota_exceeded:
+                    reason = "quota exceeded"
+                elif invalid_body:
+                    reason = "invalid JSON response"
+                else:
+                    reason = f"API error {resp.status_code}"
+                raise DeezerAPIError(f"{reason} for {path}", resp.status_code)
+            # Back off outside the semaphore so waiting retries don't hold a slot.
+            await asyncio.sleep(self._backoff(attempt, resp))
+            attempt += 1
+
+    async def get_many(self, requests: Iterable[Request]) -> List[Any]:
+        """Run requests concurrently; failures are returned in place as exceptions."""
+        return await asyncio.gather(
+            *(self.get(path, params) for path, params in requests),
+            return_exceptions=True,
+        )
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class DeezerClient:
+    """Blocking, thread-safe facade over AsyncDeezerClient."""
+
+    def __init__(self, **kwargs):
+        self._async = AsyncDeezerClient(**kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="deezer-client", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def get(self, path: str, params: Optional[Dict] = None, refresh: bool = False) -> Any:
+        return self._run(self._async.get(path, params, refresh))
+
+    def get_many(self, requests: Iterable[Request]) -> List[Any]:
+        return self._run(self._async.get_many(list(requests)))
+
+    @property
+    def cache(self) -> Optional[ResponseCache]:
+        return self._async.cache
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        self._run(self._async.aclose())
+        if self._async.cache is not None:
+            self._async.cache.flush()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
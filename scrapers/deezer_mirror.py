@@ -0,0 +1,169 @@
+"""
+Local mirror of the Deezer artists, albums and tracks the crawler has seen.
+
+ingest_deezer.py stores the raw payloads it fetches (artist objects, album
+lists and top tracks) in the deezer_mirror_* tables, with an FTS5 index over
+track title and artist name; the tables, index and sync triggers come from a
+Laravel migration. The matching scripts look up candidates here first and only
+search the Deezer API when the mirror has no good enough match. Mirror track
+payloads have the same shape as /search/track results, so the usual scoring
+applies unchanged.
+"""
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Sequence
+
+from app_schema import require_tables
+
+TOKEN_RE = re.compile(r"\w+")
+
+MIRROR_TABLES = (
+    "deezer_mirror_artists",
+    "deezer_mirror_albums",
+    "deezer_mirror_tracks",
+    "deezer_mirror_tracks_fts",
+)
+
+
+def require_schema(cur):
+    """The mirror tables come from a Laravel migration; stop early if it hasn't run."""
+    require_tables(cur, *MIRROR_TABLES)
+
+
+def _int_id(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _dump(payload: dict) -> str:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def store_payloads(cur, artist_obj: dict, albums: Sequence[dict], tracks: Sequence[dict]):
+    """Upsert one artist's fetched payloads; the caller owns the transaction."""
+    now = time.time()
+    artist_id = _int_id(artist_obj.get("id"))
+    artist_name = artist_obj.get("name") or ""
+    if artist_id is not None:
+        cur.execute(
+            """
+            INSERT INTO deezer_mirror_artists (id, name, payload, fetched_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                name=excluded.name, payload=excluded.payload, fetched_at=excluded.fetched_at
+            """,
+            (artist_id, artist_name, _dump(artist_obj), now),
+        )
+
+    cur.executemany(
+        """
+        INSERT INTO deezer_mirror_albums (id, artist_id, title, payload, fetched_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            artist_id=excluded.artist_id, title=excluded.title,
+            payload=excluded.payload, fetched_at=excluded.fetched_at
+        """,
+        [
+            (_int_id(album["id"]), artist_id, album.get("title") or "", _dump(album), now)
+            for album in albums
+            if _int_id(album.get("id")) is not None
+        ],
+    )
+
+    rows = []
+    for track in tracks:
+        track_id = _int_id(track.get("id"))
+        if track_id is None:
+            continue
+        track_artist = track.get("artist") or {}
+        rows.append(
+            (
+                track_id,
+                track.get("title") or "",
+                _int_id(track_artist.get("id")) or artist_id,
+                track_artist.get("name") or artist_name,
+                _int_id((track.get("album") or {}).get("id")),
+                _dump(track),
+                now,
+            )
+        )
+    cur.executemany(
+        """
+        INSERT INTO deezer_mirror_tracks
+            (id, title, artist_id, artist_name, album_id, payload, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            title=excluded.title, artist_id=excluded.artist_id,
+            artist_name=excluded.artist_name, album_id=excluded.album_id,
+            payload=excluded.payload, fetched_at=excluded.fetched_at
+        """,
+        rows,
+    )
+
+
+def _fts_terms(text: str) -> List[str]:
+    return ['"' + token + '"' for token in TOKEN_RE.findall((text or "").lower())]
+
+
+def fts_query(track_name: str, artist_name: Optional[str]) -> Optional[str]:
+    """All artist words and any title word, so noisy titles still find candidates."""
+    title_terms = _fts_terms(track_name)
+    if not title_terms:
+        return None
+    query = "title : (" + " OR ".join(title_terms) + ")"
+    artist_terms = _fts_terms(artist_name) if artist_name else []
+    if artist_terms:
+        query = "artist_name : (" + " ".join(artist_terms) + ") AND " + query
+    return query
+
+
+class DeezerMirror:
+    """Thread-safe candidate lookups against the mirror tables."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        require_schema(self._conn)
+        self.hits = 0
+        self.misses = 0
+
+    def candidates(
+        self, track_name: str, artist_name: Optional[str] = None, limit: int = 10
+    ) -> List[dict]:
+        """Best FTS matches as /search/track-shaped payloads."""
+        query = fts_query(track_name, artist_name)
+        if query is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT t.payload FROM deezer_mirror_tracks_fts f
+                JOIN deezer_mirror_tracks t ON t.id = f.rowid
+                WHERE deezer_mirror_tracks_fts MATCH ?
+                ORDER BY bm25(deezer_mirror_tracks_fts)
+                LIMIT ?
+                """,
+                (query, limit),
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return f"Local mirror: {self.hits} hits, {self.misses} misses, hit rate {rate:.1f}%"
+
+    def close(self):
+        self._conn.close()
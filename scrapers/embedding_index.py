@@ -0,0 +1,362 @@
+"""
+Approximate nearest-neighbour index over track_embeddings (IVF, NumPy only).
+
+Vectors are unit-normalised, so cosine similarity is a dot product. The index
+clusters them with spherical k-means into ~sqrt(n) inverted lists; a query
+scores the centroids, scans only the best --nprobe lists and returns the top K
+tracks, optionally restricted to one radio_genre_key.
+
+The index is saved as <db name>.ivf.npz next to the database together with a
+signature of the embedding table (row count, last update, embedding_meta) and
+a checksum of the tracks' radio_genre_key values, which are baked into the
+index for genre gating. `build` is a no-op while that signature is unchanged. When only some
+embeddings changed, the existing centroids are kept and vectors are just
+re-assigned. They are retrained when the embedding space changes or the
+catalogue has doubled.
+
+    python embedding_index.py [--db PATH] build [--force]
+    python embedding_index.py [--db PATH] query TRACK_ID [-k 20] [--genre KEY | --same-genre] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from compute_embeddings import BLOB_DTYPES, BLOB_HEADER, BLOB_VERSION, read_meta
+
+DEFAULT_DB = os.path.join(os.path.dirname(__file__), "..", "database", "database.sqlite")
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 100_000
+ASSIGN_BLOCK = 20_000
+DEFAULT_NPROBE = 16
+
+BLOB_NUMPY_DTYPES = {dtype: {"f": "<f4", "e": "<f2"}[code] for dtype, code in BLOB_DTYPES.values()}
+
+
+def default_index_path(db_path: str) -> str:
+    return os.path.splitext(db_path)[0] + ".ivf.npz"
+
+
+def decode_row(embedding: Optional[str], blob: Optional[bytes]) -> Optional[np.ndarray]:
+    if blob:
+        version, dtype, dim = BLOB_HEADER.unpack_from(blob)
+        if version != BLOB_VERSION or dtype not in BLOB_NUMPY_DTYPES:
+            return None
+        return np.frombuffer(blob, dtype=BLOB_NUMPY_DTYPES[dtype], count=dim, offset=BLOB_HEADER.size)
+    if embedding:
+        return np.asarray(json.loads(embedding), dtype=np.float32)
+    return None
+
+
+def embedding_signature(conn) -> str:
+    """Changes whenever track_embeddings or the embedding settings change."""
+    count, updated = conn.execute(
+        "SELECT COUNT(*), MAX(updated_at) FROM track_embeddings"
+    ).fetchone()
+    meta = read_meta(conn.cursor())
+    settings = sorted(
+        (k, v) for k, v in meta.items() if k != "norm_stats" and not k.endswith("_signature")
+    )
+    return json.dumps([count, updated, settings])
+
+
+def genre_checksum(conn) -> Optional[int]:
+    """CRC32 over (track id, radio_genre_key) of embedded tracks; None without the column."""
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(tracks)")
+    if "radio_genre_key" not in [row[1] for row in cur.fetchall()]:
+        return None
+    # Genre backfills don't touch updated_at, so the keys themselves are hashed.
+    cur.execute(
+        """
+        SELECT e.track_id, t.radio_genre_key
+        FROM track_embeddings e
+        JOIN tracks t ON t.id = e.track_id
+        ORDER BY e.track_id
+        """
+    )
+    crc = 0
+    for track_id, key in cur:
+        crc = zlib.crc32(f"{track_id}\t{key or ''}\n".encode("utf-8"), crc)
+    return crc
+
+
+def index_signature(conn) -> str:
+    """embedding_signature plus the genre keys stored alongside the vectors."""
+    return json.dumps([embedding_signature(conn), genre_checksum(conn)])
+
+
+def space_signature(conn) -> str:
+    """Changes only when vectors stop being comparable (hash scheme, dims, weights)."""
+    meta = read_meta(conn.cursor())
+    return json.dumps(sorted((k, v) for k, v in meta.items() if k not in ("norm_stats", "format", "keep_json")))
+
+
+def load_embeddings(conn) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(track ids, radio_genre_keys, float32 matrix) for every decodable embedding."""
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(track_embeddings)")
+    has_blob = "embedding_blob" in [row[1] for row in cur.fetchall()]
+    cur.execute("PRAGMA table_info(tracks)")
+    has_radio_key = "radio_genre_key" in [row[1] for row in cur.fetchall()]
+    cur.execute(
+        f"""
+        SELECT e.track_id,
+               {'t.radio_genre_key' if has_radio_key else 'NULL'},
+               e.embedding,
+               {'e.embedding_blob' if has_blob else 'NULL'}
+        FROM track_embeddings e
+        JOIN tracks t ON t.id = e.track_id
+        ORDER BY e.track_id
+        """
+    )
+    ids, genres, vectors = [], [], []
+    dim = None
+    for track_id, genre, embedding, blob in cur:
+        vector = decode_row(embedding, blob)
+        if vector is None:
+            continue
+        if dim is None:
+            dim = vector.shape[0]
+        if vector.shape[0] != dim:
+            continue
+        ids.append(track_id)
+        genres.append(genre or "")
+        vectors.append(vector)
+    matrix = np.vstack(vectors).astype(np.float32) if vectors else np.zeros((0, 0), np.float32)
+    return np.asarray(ids, dtype=str), np.asarray(genres, dtype=str), matrix
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid per vector, in blocks to bound memory."""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = vectors[start:start + ASSIGN_BLOCK]
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the vectors."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > KMEANS_SAMPLE:
+        sample = vectors[rng.choice(len(vectors), KMEANS_SAMPLE, replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Re-seed empty clusters with random vectors so every list stays useful.
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        norms[empty] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        ids: np.ndarray,
+        genres: np.ndarray,
+        vectors: np.ndarray,
+        signature: str = "",
+        space: str = "",
+    ):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.genres = genres
+        self.vectors = vectors
+        self.signature = signature
+        self.space = space
+        self._positions: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def build(
+        cls,
+        ids: np.ndarray,
+        genres: np.ndarray,
+        vectors: np.ndarray,
+        nlist: Optional[int] = None,
+        centroids: Optional[np.ndarray] = None,
+        signature: str = "",
+        space: str = "",
+    ) -> "IVFIndex":
+        if centroids is None:
+            nlist = nlist or max(1, int(math.sqrt(len(vectors))))
+            centroids = train_centroids(vectors, min(nlist, len(vectors)))
+        labels = assign(vectors, centroids)
+        # Store vectors grouped by list; offsets[i]:offsets[i+1] is list i.
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(
+            centroids, offsets, ids[order], genres[order], vectors[order], signature, space
+        )
+
+    def save(self, path: str):
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            centroids=self.centroids,
+            offsets=self.offsets,
+            ids=self.ids,
+            genres=self.genres,
+            vectors=self.vectors,
+            signature=np.asarray(self.signature),
+            space=np.asarray(self.space),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            return cls(
+                data["centroids"],
+                data["offsets"],
+                data["ids"],
+                data["genres"],
+                data["vectors"],
+                str(data["signature"]),
+                str(data["space"]),
+            )
+
+    def vector_for(self, track_id: str) -> Optional[np.ndarray]:
+        if self._positions is None:
+            self._positions = {str(track_id): i for i, track_id in enumerate(self.ids)}
+        pos = self._positions.get(track_id)
+        return None if pos is None else self.vectors[pos]
+
+    def genre_for(self, track_id: str) -> Optional[str]:
+        self.vector_for(track_id)
+        pos = self._positions.get(track_id)
+        return None if pos is None else str(self.genres[pos]) or None
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 20,
+        nprobe: int = DEFAULT_NPROBE,
+        genre: Optional[str] = None,
+        exclude: Tuple[str, ...] = (),
+    ) -> List[Tuple[str, float]]:
+        """Top-k (track_id, cosine) among the nprobe closest lists."""
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        candidates = np.concatenate(
+            [np.arange(self.offsets[i], self.offsets[i + 1]) for i in probe]
+        )
+        if genre is not None:
+            candidates = candidates[self.genres[candidates] == genre]
+        if exclude:
+            candidates = candidates[~np.isin(self.ids[candidates], list(exclude))]
+        if len(candidates) == 0:
+            return []
+        scores = self.vectors[candidates] @ query
+        top = min(k, len(candidates))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [(str(self.ids[candidates[i]]), float(scores[i])) for i in best]
+
+
+def build_index(db_path: str, index_path: str, force: bool = False) -> Optional[IVFIndex]:
+    """Build or refresh the index file; returns None when it was already current."""
+    conn = sqlite3.connect(db_path)
+    try:
+        signature = index_signature(conn)
+        space = space_signature(conn)
+        previous = IVFIndex.load(index_path) if os.path.exists(index_path) else None
+        if previous is not None and previous.signature == signature and not force:
+            return None
+        ids, genres, vectors = load_embeddings(conn)
+    finally:
+        conn.close()
+    if len(vectors) == 0:
+        raise SystemExit("No embeddings found; run compute_embeddings.py first.")
+
+    centroids = None
+    if (
+        previous is not None
+        and not force
+        and previous.space == space
+        and previous.centroids.shape[1] == vectors.shape[1]
+        and len(vectors) <= 2 * len(previous.ids)
+    ):
+        # Same embedding space and similar size: keep the clustering, re-assign only.
+        centroids = previous.centroids
+    index = IVFIndex.build(ids, genres, vectors, centroids=centroids, signature=signature, space=space)
+    index.save(index_path)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF nearest-neighbour index over track embeddings.")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--index", help="Index file (default: <db>.ivf.npz next to the database).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build or refresh the index.")
+    build.add_argument("--force", action="store_true", help="Retrain even if nothing changed.")
+
+    query = sub.add_parser("query", help="Nearest tracks to a seed track.")
+    query.add_argument("track_id")
+    query.add_argument("-k", type=int, default=20)
+    query.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE)
+    gate = query.add_mutually_exclusive_group()
+    gate.add_argument("--genre", help="Only return tracks with this radio_genre_key.")
+    gate.add_argument("--same-genre", action="store_true", help="Gate on the seed's radio_genre_key.")
+    query.add_argument("--json", action="store_true", help="Print a JSON list of track ids.")
+    args = parser.parse_args()
+
+    index_path = args.index or default_index_path(args.db)
+
+    if args.command == "build":
+        start = time.time()
+        index = build_index(args.db, index_path, force=args.force)
+        if index is None:
+            print(f"Index is up to date: {index_path}")
+        else:
+            print(
+                f"Indexed {len(index.ids)} tracks in {len(index.centroids)} lists "
+                f"({time.time() - start:.1f}s) -> {index_path}"
+            )
+        return
+
+    if not os.path.exists(index_path):
+        raise SystemExit(f"No index at {index_path}; run `embedding_index.py build` first.")
+    index = IVFIndex.load(index_path)
+    seed = index.vector_for(args.track_id)
+    if seed is None:
+        raise SystemExit(f"Track {args.track_id} is not in the index.")
+    genre = index.genre_for(args.track_id) if args.same_genre else args.genre
+
+    start = time.perf_counter()
+    results = index.search(seed, k=args.k, nprobe=args.nprobe, genre=genre, exclude=(args.track_id,))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if args.json:
+        json.dump([track_id for track_id, _ in results], sys.stdout)
+        print()
+        return
+    for track_id, score in results:
+        print(f"{track_id}\t{score:.4f}")
+    print(f"{len(results)} neighbours in {elapsed_ms:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+String similarity for matching database tracks against Deezer search results.
+
+ratio() is the normalised indel similarity 2 * LCS / (len(a) + len(b)) on
+lower-cased strings, the quantity difflib's SequenceMatcher.ratio()
+approximates. The LCS length is computed with the bit-parallel algorithm
+(one big-int update per character of the other string) instead of
+SequenceMatcher's pure-Python block search. SequenceMatcher only finds a
+common subsequence, so ratio() is never lower than difflib's score: equal on
+most titles, higher on pairs where difflib's greedy block search misses the
+longest alignment. The 0.6/0.4 title/artist weighting is unchanged. The
+benchmark below sweeps candidate thresholds for ratio() against difflib's
+accept/reject decisions at a given threshold; on synthetic title pages the
+best agreement is still at 0.70 and 0.60, so the matchers keep their
+thresholds and accept the small upward drift.
+
+score_page() scores a whole page of search results in one call: the bit
+masks are built once for the expected title and once for the expected artist,
+and every distinct result title and artist name on the page is run against
+them (a page usually repeats the same artist several times).
+
+    python fuzzy_match.py --db ../database/database.sqlite [--cache-db PATH]
+
+benchmarks ratio() against difflib on the tracks in the database, re-scoring
+cached search pages when they are available.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+import time
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+TITLE_WEIGHT = 0.6
+ARTIST_WEIGHT = 0.4
+
+
+@lru_cache(maxsize=65536)
+def normalize(s: str) -> str:
+    return (s or "").lower()
+
+
+@lru_cache(maxsize=65536)
+def _masks(s: str) -> Dict[str, int]:
+    masks: Dict[str, int] = {}
+    for i, ch in enumerate(s):
+        masks[ch] = masks.get(ch, 0) | (1 << i)
+    return masks
+
+
+def lcs_length(a: str, b: str) -> int:
+    """Length of the longest common subsequence of a and b (bit-parallel)."""
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return 0
+    masks = _masks(a)
+    full = (1 << len(a)) - 1
+    v = full
+    for ch in b:
+        m = masks.get(ch)
+        if m:
+            u = v & m
+            v = ((v + u) | (v - u)) & full
+    return len(a) - bin(v).count("1")
+
+
+def _lcs_with(masks: Dict[str, int], length: int, b: str) -> int:
+    """LCS length of b against a string whose bit masks and length are given."""
+    full = (1 << length) - 1
+    v = full
+    for ch in b:
+        m = masks.get(ch)
+        if m:
+            u = v & m
+            v = ((v + u) | (v - u)) & full
+    return length - bin(v).count("1")
+
+
+def ratios_against(expected: str, candidates: Sequence[str]) -> List[float]:
+    """ratio(expected, c) for every candidate, sharing expected's masks."""
+    expected = normalize(expected)
+    masks = _masks(expected)
+    length = len(expected)
+    scored: Dict[str, float] = {}
+    out = []
+    for candidate in candidates:
+        score = scored.get(candidate)
+        if score is None:
+            b = normalize(candidate)
+            total = length + len(b)
+            lcs = _lcs_with(masks, length, b) if length and b else 0
+            score = scored[candidate] = 2.0 * lcs / total if total else 1.0
+        out.append(score)
+    return out
+
+
+def ratio(a: str, b: str) -> float:
+    """Similarity between two strings (0-1), case-insensitive."""
+    a, b = normalize(a), normalize(b)
+    total = len(a) + len(b)
+    if total == 0:
+        return 1.0
+    return 2.0 * lcs_length(a, b) / total
+
+
+def score_page(
+    expected_track: str, expected_artist: Optional[str], results: Sequence[dict]
+) -> List[float]:
+    """Combined score for every result on a search page.
+
+    With an expected artist the score is 0.6 * title + 0.4 * artist, otherwise
+    just the title score.
+    """
+    titles = ratios_against(expected_track, [r.get("title", "") for r in results])
+    if not expected_artist:
+        return titles
+    artists = ratios_against(
+        expected_artist, [(r.get("artist") or {}).get("name", "") for r in results]
+    )
+    return [t * TITLE_WEIGHT + a * ARTIST_WEIGHT for t, a in zip(titles, artists)]
+
+
+def best_match(
+    expected_track: str, expected_artist: Optional[str], results: Sequence[dict]
+) -> Tuple[Optional[dict], float]:
+    """Highest scoring result on a page (first one wins ties) and its score."""
+    best, best_score = None, 0.0
+    for result, score in zip(results, score_page(expected_track, expected_artist, results)):
+        if score > best_score:
+            best, best_score = result, score
+    return best, best_score
+
+
+def _difflib_page(
+    expected_track: str, expected_artist: Optional[str], results: Sequence[dict]
+) -> List[float]:
+    def sim(a, b):
+        return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+
+    scores = []
+    for result in results:
+        score = sim(expected_track, result.get("title", ""))
+        if expected_artist:
+            artist = (result.get("artist") or {}).get("name", "")
+            score = score * TITLE_WEIGHT + sim(expected_artist, artist) * ARTIST_WEIGHT
+        scores.append(score)
+    return scores
+
+
+def load_pages(db_path: str, cache_db: Optional[str], limit: int):
+    """(track, artist, results) triples: cached search pages, or synthetic ones."""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        """
+        SELECT t.name, a.name FROM tracks t
+        JOIN artists a ON t.artist_id = a.id
+        LIMIT ?
+        """,
+        (limit,),
+    ).fetchall()
+    conn.close()
+
+    cache = None
+    if cache_db:
+        from response_cache import ResponseCache
+
+        cache = ResponseCache(cache_db)
+    pages = []
+    for track_name, artist_name in rows:
+        page = None
+        if cache is not None:
+            payload = cache.get("search/track", {"q": f"{artist_name} {track_name}", "limit": 5})
+            page = (payload or {}).get("data")
+        if not page:
+            # No cached page: compare against the track itself plus random others.
+            others = random.sample(rows, min(9, len(rows)))
+            page = [{"title": t, "artist": {"name": a}} for t, a in [(track_name, artist_name)] + others]
+        pages.append((track_name, artist_name, page))
+    if cache is not None:
+        print(cache.summary())
+        cache.close()
+    return pages
+
+
+def benchmark(pages, threshold: float):
+    normalize.cache_clear()
+    _masks.cache_clear()
+
+    start = time.process_time()
+    old = [_difflib_page(t, a, page) for t, a, page in pages]
+    old_time = time.process_time() - start
+
+    start = time.process_time()
+    new = [score_page(t, a, page) for t, a, page in pages]
+    new_time = time.process_time() - start
+
+    diffs = [n - o for o_page, n_page in zip(old, new) for o, n in zip(o_page, n_page)]
+    same_best = sum(
+        1 for o, n in zip(old, new) if o and o.index(max(o)) == n.index(max(n))
+    )
+    same_decision = sum(
+        1 for o, n in zip(old, new) if o and (max(o) >= threshold) == (max(n) >= threshold)
+    )
+    print(f"Pages:               {len(pages)} ({len(diffs)} results)")
+    print(f"difflib CPU time:    {old_time:.3f}s")
+    print(f"fuzzy_match CPU:     {new_time:.3f}s ({old_time / new_time if new_time else 0:.1f}x)")
+    print(f"Mean score delta:    {sum(diffs) / len(diffs) if diffs else 0:+.4f}")
+    print(f"Max score delta:     {max(diffs, default=0):+.4f}")
+    print(f"Same best result:    {same_best}/{len(pages)}")
+    print(f"Same accept/reject:  {same_decision}/{len(pages)} at {threshold:.0%}")
+
+    # ratio() >= difflib, so only thresholds at or above the old one can restore agreement.
+    old_best = [max(o) for o in old if o]
+    new_best = [max(n) for n in new if n]
+    sweep = []
+    for step in range(11):
+        candidate = round(threshold + step / 100, 2)
+        agree = sum(
+            (o >= threshold) == (n >= candidate) for o, n in zip(old_best, new_best)
+        )
+        sweep.append((agree, -candidate))
+    agree, candidate = max(sweep)
+    print(f"Best ratio() cutoff: {-candidate:.2f} ({agree}/{len(old_best)} same decisions)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy_match against difflib.")
+    parser.add_argument("--db", default="../database/database.sqlite")
+    parser.add_argument("--cache-db", help="Re-score cached /search/track pages from this cache.")
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    args = parser.parse_args()
+    benchmark(load_pages(args.db, args.cache_db, args.limit), args.threshold)
+
+
+if __name__ == "__main__":
+    main()
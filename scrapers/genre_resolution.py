@@ -0,0 +1,687 @@
+"""
+Genre lookup tables and resolution rules shared by the scrapers.
+
+One place for the Deezer genre id/name mappings and the three per-track
+genre columns:
+– category_slug / deezer_genre_id: the track's own genre, filled from the
+  album genre or the artist's dominant album genre when the track has none
+  (normalize_genres.py).
+– radio_genre_key: a trusted coarse anchor for Radio gating, from direct
+  metadata or album/artist dominance (backfill_radio_genre_key.py).
+
+ingest_deezer.py uses extract_genre() on API payloads and compute_embeddings.py
+uses embedding_slug() for the text surface.
+
+    python genre_resolution.py [--db PATH]
+
+resolves all three columns in one streamed pass over tracks and writes only
+the rows that change, so the post-ingest jobs do not each scan and update the
+table on their own.
+
+With --incremental only albums and artists that gained or changed tracks (or
+album genres) since the last run are revisited, found through an updated_at
+watermark kept in genre_resolution_state. Deleted tracks are not noticed, so
+an occasional full run is still worthwhile.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app_schema import require_tables
+
+GENRE_FALLBACK_SLUG = "unknown"
+
+# Slugs that carry no genre information.
+PLACEHOLDERS = frozenset({"", "unknown", "misc", "other", "music", "various", "various-artists"})
+
+GENRE_ID_MAP: Dict[int, str] = {
+    132: "pop",
+    116: "hip-hop",
+    152: "metal",
+    85: "rock",
+    98: "folk-and-acoustic",
+    173: "classical",
+    169: "jazz",
+    113: "dance-electronic",
+    165: "soul",
+    464: "dance-electronic",
+    4642: "latin",
+    52: "metal",
+    1520: "metal",
+    1521: "rock",
+    1522: "rock",
+    1523: "rock",
+    75: "reggae",
+    1324: "country",
+    84: "punk",
+}
+GENRE_ID_TO_SLUG: Dict[str, str] = {str(genre_id): slug for genre_id, slug in GENRE_ID_MAP.items()}
+
+# Canonical Deezer id per slug: the first id listed for it above.
+SLUG_TO_ID: Dict[str, str] = {}
+for _genre_id, _slug in GENRE_ID_TO_SLUG.items():
+    SLUG_TO_ID.setdefault(_slug, _genre_id)
+
+GENRE_NAME_KEYWORDS = [
+    ("metal", "metal"),
+    ("rock", "rock"),
+    ("pop", "pop"),
+    ("hip hop", "hip-hop"),
+    ("hip-hop", "hip-hop"),
+    ("rap", "hip-hop"),
+    ("edm", "dance-electronic"),
+    ("dance", "dance-electronic"),
+    ("electro", "dance-electronic"),
+    ("soul", "soul"),
+    ("r&b", "soul"),
+    ("rnb", "soul"),
+    ("jazz", "jazz"),
+    ("country", "country"),
+    ("folk", "folk-and-acoustic"),
+    ("acoustic", "folk-and-acoustic"),
+    ("classical", "classical"),
+    ("latin", "latin"),
+    ("reggae", "reggae"),
+    ("blues", "blues"),
+    ("punk", "punk"),
+]
+
+# Earlier keywords win, wherever they occur in the name.
+_KEYWORD_RANK: Dict[str, Tuple[int, str]] = {}
+for _rank, (_keyword, _slug) in enumerate(GENRE_NAME_KEYWORDS):
+    _KEYWORD_RANK.setdefault(_keyword, (_rank, _slug))
+# The lookahead reports a match at every position, overlapping ones included;
+# at a given position the alternation tries keywords in priority order.
+_KEYWORD_RE = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword, _ in GENRE_NAME_KEYWORDS) + "))")
+
+# Minimal coarse set for radio_genre_key: must roughly align with GenreGraph keys.
+RADIO_KEYS = frozenset({
+    "metal",
+    "rock",
+    "punk",
+    "pop",
+    "dance-electronic",
+    "rnb",
+    "soul",
+    "jazz",
+    "blues",
+    "hip-hop",
+    "classical",
+    "instrumental",
+    "ambient",
+    "electronic",
+    "latin",
+    "reggae",
+    "country",
+    "folk-and-acoustic",
+})
+
+# Deezer 132 ("pop") was previously used as a default fallback in this repo.
+# Treat it as untrusted for radio keys unless supported by other metadata.
+UNTRUSTED_RADIO_IDS = frozenset({"132"})
+
+
+# --- API payloads (ingest) -------------------------------------------------
+
+
+def normalize_genre_id(value) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        genre_id = int(value)
+        return genre_id if genre_id > 0 else None
+    except (TypeError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=4096)
+def slug_from_name(name: str) -> Optional[str]:
+    """Slug of the first GENRE_NAME_KEYWORDS entry found in the name.
+
+    One regex scan instead of a substring search per keyword; Deezer genre
+    names repeat heavily, so most calls are cache hits.
+    """
+    if not name:
+        return None
+    best: Optional[Tuple[int, str]] = None
+    for match in _KEYWORD_RE.finditer(name.lower()):
+        hit = _KEYWORD_RANK[match.group(1)]
+        if best is None or hit < best:
+            best = hit
+            if hit[0] == 0:
+                break
+    return best[1] if best else None
+
+
+def map_genre_id(genre_id: Optional[int]) -> str:
+    if genre_id is None:
+        return GENRE_FALLBACK_SLUG
+    return GENRE_ID_MAP.get(genre_id, GENRE_FALLBACK_SLUG)
+
+
+def extract_genre(
+    track: Optional[dict],
+    album: Optional[dict],
+    artist: Optional[dict],
+) -> Tuple[Optional[int], str]:
+    ids: List[int] = []
+    names: List[str] = []
+
+    def gather(obj: Optional[dict]):
+        if not obj:
+            return
+        gid = normalize_genre_id(obj.get("genre_id"))
+        if gid is not None:
+            ids.append(gid)
+        genres = (obj.get("genres") or {}).get("data") or []
+        for item in genres:
+            gid = normalize_genre_id(item.get("id"))
+            if gid is not None:
+                ids.append(gid)
+            name = item.get("name")
+            if name:
+                names.append(name)
+
+    gather(track)
+    gather(album)
+    gather(artist)
+
+    slug = None
+    for name in names:
+        slug = slug_from_name(name)
+        if slug:
+            break
+
+    if slug is None:
+        for gid in ids:
+            slug = map_genre_id(gid)
+            if slug and slug != GENRE_FALLBACK_SLUG:
+                break
+
+    if slug is None:
+        slug = GENRE_FALLBACK_SLUG
+
+    genre_id = ids[0] if ids else None
+    return genre_id, slug
+
+
+# --- category_slug / deezer_genre_id --------------------------------------
+
+
+def normalize_slug(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    s = str(value).strip().lower()
+    if s in PLACEHOLDERS:
+        return None
+    return s
+
+
+def slug_from_id(genre_id: Optional[str]) -> Optional[str]:
+    if not genre_id:
+        return None
+    return GENRE_ID_TO_SLUG.get(str(genre_id).strip())
+
+
+def dominant_slug(slugs: List[Optional[str]]) -> Optional[str]:
+    counts = Counter([s for s in slugs if s])
+    if not counts:
+        return None
+    slug, count = counts.most_common(1)[0]
+    if count == 0:
+        return None
+    return slug
+
+
+# --- radio_genre_key -------------------------------------------------------
+
+
+def radio_slug(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    s = str(value).strip().lower()
+    if s in PLACEHOLDERS or s not in RADIO_KEYS:
+        return None
+    return s
+
+
+def radio_slug_from_id(genre_id: Optional[str]) -> Optional[str]:
+    if genre_id is None:
+        return None
+    raw = str(genre_id).strip()
+    if raw in UNTRUSTED_RADIO_IDS:
+        return None
+    return radio_slug(GENRE_ID_TO_SLUG.get(raw))
+
+
+def dominant_key(counts: Counter, min_share: float, min_count: int) -> Optional[str]:
+    if not counts:
+        return None
+    key, count = counts.most_common(1)[0]
+    total = sum(counts.values())
+    if total < min_count:
+        return None
+    if total == 0:
+        return None
+    if (count / total) < min_share:
+        return None
+    return key
+
+
+# --- embeddings ------------------------------------------------------------
+
+
+def embedding_slug(
+    radio_genre_key: Optional[str],
+    category_slug: Optional[str],
+    deezer_genre_id: Optional[str],
+    album_genre: Optional[str],
+) -> Optional[str]:
+    for cand in (radio_genre_key, category_slug, album_genre):
+        slug = normalize_slug(cand)
+        if slug:
+            return slug
+    return slug_from_id(deezer_genre_id)
+
+
+# --- single-pass resolution -------------------------------------------------
+
+
+class ResolutionState:
+    """updated_at watermark and settings of the last run, per resolver mode."""
+
+    def __init__(self, cur):
+        require_tables(cur, "genre_resolution_state")
+        self.cur = cur
+
+    def last(self, mode: str, settings: str) -> Optional[str]:
+        """Watermark of the last run with the same settings, if any."""
+        self.cur.execute(
+            "SELECT watermark, settings FROM genre_resolution_state WHERE mode = ?", (mode,)
+        )
+        row = self.cur.fetchone()
+        if row is None or row[0] is None or row[1] != settings:
+            return None
+        return row[0]
+
+    def record(self, mode: str, watermark: Optional[str], settings: str):
+        self.cur.execute(
+            """
+            INSERT INTO genre_resolution_state (mode, watermark, settings, resolved_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(mode) DO UPDATE SET
+                watermark=excluded.watermark, settings=excluded.settings,
+                resolved_at=excluded.resolved_at
+            """,
+            (mode, watermark, settings, time.time()),
+        )
+
+
+def current_watermark(cur) -> Optional[str]:
+    """Latest updated_at, capped a second short of now.
+
+    updated_at has one-second resolution, so rows still being written in the
+    current second stay above the watermark and are picked up by the next run.
+    """
+    cur.execute(
+        """
+        SELECT MAX(stamp) FROM (
+            SELECT MAX(updated_at) AS stamp FROM tracks
+            UNION ALL
+            SELECT MAX(updated_at) FROM albums
+        )
+        """
+    )
+    latest = cur.fetchone()[0]
+    if latest is None:
+        return None
+    return min(str(latest), time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - 1)))
+
+
+SCOPE_TABLES = (
+    "genre_dirty_albums",
+    "genre_dirty_artists",
+    "genre_targets",
+    "genre_count_albums",
+    "genre_count_artists",
+    "genre_scope",
+)
+
+
+def build_scope(cur, since: str) -> Tuple[int, int]:
+    """Fill temp.genre_scope with the tracks an incremental run must read.
+
+    Targets are the tracks of every album/artist touched since the watermark;
+    the scope adds the rest of their albums' and artists' tracks, which only
+    feed the dominance counts. Id columns are left untyped so the tracks
+    indexes still apply despite album_id/artist_id's integer affinity.
+    Returns (targets, scope size).
+    """
+    for table in SCOPE_TABLES:
+        cur.execute(f"DROP TABLE IF EXISTS temp.{table}")
+    cur.execute("CREATE TEMP TABLE genre_dirty_albums (id PRIMARY KEY)")
+    cur.execute("CREATE TEMP TABLE genre_dirty_artists (id PRIMARY KEY)")
+    cur.execute("CREATE TEMP TABLE genre_targets (track_rowid INTEGER PRIMARY KEY)")
+    cur.execute("CREATE TEMP TABLE genre_count_albums (id PRIMARY KEY)")
+    cur.execute("CREATE TEMP TABLE genre_count_artists (id PRIMARY KEY)")
+    cur.execute(
+        "CREATE TEMP TABLE genre_scope (track_rowid INTEGER PRIMARY KEY, target INTEGER NOT NULL DEFAULT 0)"
+    )
+
+    cur.execute(
+        "INSERT OR IGNORE INTO genre_dirty_albums "
+        "SELECT album_id FROM tracks WHERE updated_at > ? AND album_id IS NOT NULL",
+        (since,),
+    )
+    cur.execute("INSERT OR IGNORE INTO genre_dirty_albums SELECT id FROM albums WHERE updated_at > ?", (since,))
+    cur.execute(
+        "INSERT OR IGNORE INTO genre_dirty_artists "
+        "SELECT artist_id FROM tracks WHERE updated_at > ? AND artist_id IS NOT NULL",
+        (since,),
+    )
+    # A changed album genre moves its artist's dominant album genre and the
+    # radio keys of its tracks, whose artists' dominance moves in turn.
+    cur.execute(
+        "INSERT OR IGNORE INTO genre_dirty_artists "
+        "SELECT artist_id FROM albums WHERE updated_at > ? AND artist_id IS NOT NULL",
+        (since,),
+    )
+    cur.execute(
+        "INSERT OR IGNORE INTO genre_dirty_artists "
+        "SELECT artist_id FROM tracks WHERE album_id IN (SELECT id FROM albums WHERE updated_at > ?) "
+        "AND artist_id IS NOT NULL",
+        (since,),
+    )
+
+    cur.execute(
+        "INSERT OR IGNORE INTO genre_targets "
+        "SELECT rowid FROM tracks WHERE album_id IN (SELECT id FROM genre_dirty_albums)"
+    )
+    cur.execute(
+        "INSERT OR IGNORE INTO genre_targets "
+        "SELECT rowid FROM tracks WHERE artist_id IN (SELECT id FROM genre_dirty_artists)"
+    )
+
+    cur.execute(
+        "INSERT OR IGNORE INTO genre_count_albums SELECT t.album_id FROM genre_targets g "
+        "JOIN tracks t ON t.rowid = g.track_rowid WHERE t.album_id IS NOT NULL"
+    )
+    cur.execute(
+        "INSERT OR IGNORE INTO genre_count_artists SELECT t.artist_id FROM genre_targets g "
+        "JOIN tracks t ON t.rowid = g.track_rowid WHERE t.artist_id IS NOT NULL"
+    )
+    cur.execute(
+        "INSERT OR IGNORE INTO genre_scope (track_rowid) "
+        "SELECT rowid FROM tracks WHERE album_id IN (SELECT id FROM genre_count_albums)"
+    )
+    cur.execute(
+        "INSERT OR IGNORE INTO genre_scope (track_rowid) "
+        "SELECT rowid FROM tracks WHERE artist_id IN (SELECT id FROM genre_count_artists)"
+    )
+    cur.execute("UPDATE genre_scope SET target = 1 WHERE track_rowid IN (SELECT track_rowid FROM genre_targets)")
+
+    targets = cur.execute("SELECT COUNT(*) FROM genre_targets").fetchone()[0]
+    scope = cur.execute("SELECT COUNT(*) FROM genre_scope").fetchone()[0]
+    return targets, scope
+
+
+FULL_SCAN_SQL = """
+    SELECT t.rowid, t.id, t.artist_id, t.album_id, t.category_slug,
+           t.deezer_genre_id, a.genre, t.radio_genre_key, 1
+    FROM tracks t
+    LEFT JOIN albums a ON a.id = CAST(t.album_id AS TEXT)
+    WHERE t.rowid > ?
+    ORDER BY t.rowid
+    LIMIT ?
+"""
+
+SCOPED_SCAN_SQL = """
+    SELECT t.rowid, t.id, t.artist_id, t.album_id, t.category_slug,
+           t.deezer_genre_id, a.genre, t.radio_genre_key, s.target
+    FROM temp.genre_scope s
+    JOIN tracks t ON t.rowid = s.track_rowid
+    LEFT JOIN albums a ON a.id = CAST(t.album_id AS TEXT)
+    WHERE s.track_rowid > ?
+    ORDER BY s.track_rowid
+    LIMIT ?
+"""
+
+
+class GenreResolver:
+    """Resolve category_slug, deezer_genre_id and radio_genre_key in one pass.
+
+    Tracks are streamed in rowid order. Rows whose radio key does not depend on
+    album/artist dominance are written as they are read; the rest (no direct
+    key, or an untrusted "pop") are kept as small tuples and settled once the
+    dominance counts are complete. With categories=False the category columns
+    are left alone (backfill_radio_genre_key.py). With incremental=True only
+    the scope from build_scope() is read and only its targets are written.
+    """
+
+    def __init__(
+        self,
+        album_share: float = 0.90,
+        artist_share: float = 0.80,
+        min_count: int = 5,
+        min_metal: int = 3,
+        categories: bool = True,
+    ):
+        self.album_share = album_share
+        self.artist_share = artist_share
+        self.min_count = min_count
+        self.min_metal = min_metal
+        self.categories = categories
+        self.album_slugs: Dict[str, str] = {}
+        self.artist_slugs: Dict[str, str] = {}
+        self.by_album: Dict[str, Counter] = defaultdict(Counter)
+        self.by_artist: Dict[str, Counter] = defaultdict(Counter)
+        self.stats = Counter()
+
+    def load_albums(self, cur):
+        """Album genres and each artist's dominant album genre (category rule)."""
+        cur.execute("SELECT id, artist_id, genre FROM albums")
+        artist_albums: Dict[str, List[Optional[str]]] = defaultdict(list)
+        for album_id, artist_id, genre in cur.fetchall():
+            slug = normalize_slug(genre)
+            if slug:
+                self.album_slugs[str(album_id)] = slug
+            if genre is not None and artist_id is not None:
+                artist_albums[str(artist_id)].append(slug)
+        for artist_id, slugs in artist_albums.items():
+            slug = dominant_slug(slugs)
+            if slug:
+                self.artist_slugs[artist_id] = slug
+
+    def category(
+        self, category_slug, deezer_genre_id, album_id: Optional[str], artist_id: Optional[str]
+    ) -> Tuple[Optional[str], Optional[str]]:
+        if not self.categories or normalize_slug(category_slug) or slug_from_id(deezer_genre_id):
+            return category_slug, deezer_genre_id
+        chosen = self.album_slugs.get(album_id) or self.artist_slugs.get(artist_id)
+        chosen_id = SLUG_TO_ID.get(chosen) if chosen else None
+        if not chosen_id:
+            # Only write when we can map to a known coarse key.
+            return category_slug, deezer_genre_id
+        return chosen, chosen_id
+
+    def dominance(self) -> Tuple[Dict[str, Optional[str]], Dict[str, Optional[str]]]:
+        album_dom = {
+            album_id: dominant_key(counts, self.album_share, self.min_count)
+            for album_id, counts in self.by_album.items()
+        }
+        artist_dom = {
+            artist_id: dominant_key(counts, self.artist_share, self.min_count)
+            for artist_id, counts in self.by_artist.items()
+        }
+        # Pragmatic override: if an artist has a non-trivial count of metal tracks,
+        # treat "pop" as suspect and anchor the artist to metal.
+        for artist_id, counts in self.by_artist.items():
+            if counts.get("metal", 0) >= self.min_metal and artist_dom.get(artist_id) in (None, "pop"):
+                artist_dom[artist_id] = "metal"
+        return album_dom, artist_dom
+
+    @property
+    def mode(self) -> str:
+        return "all" if self.categories else "radio"
+
+    @property
+    def settings(self) -> str:
+        return json.dumps([self.album_share, self.artist_share, self.min_count, self.min_metal])
+
+    def run(
+        self,
+        conn,
+        chunk_size: int = 5000,
+        write_batch: int = 5000,
+        incremental: bool = False,
+        log=print,
+    ) -> Counter:
+        cur = conn.cursor()
+        cur.execute("PRAGMA table_info(tracks)")
+        if "radio_genre_key" not in {row[1] for row in cur.fetchall()}:
+            raise SystemExit("tracks.radio_genre_key column missing; run migrations first.")
+
+        started = time.time()
+        state = ResolutionState(cur)
+        # Read before scanning: anything written during the run is newer and
+        # is picked up again next time.
+        watermark = current_watermark(cur)
+        since = state.last(self.mode, self.settings) if incremental else None
+        if incremental and since is None:
+            log("No previous run with these settings; resolving every track.")
+
+        if since is not None:
+            targets, total = build_scope(cur, since)
+            scan_sql = SCOPED_SCAN_SQL
+            self.stats["targets"] = targets
+            log(f"[{time.time() - started:6.1f}s] {targets} tracks to resolve since {since} ({total} to read)")
+        else:
+            total = cur.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+            scan_sql = FULL_SCAN_SQL
+            self.stats["targets"] = total
+        if self.categories:
+            self.load_albums(cur)
+
+        pending: List[tuple] = []
+        deferred: List[tuple] = []
+
+        def write(force: bool = False):
+            if pending and (force or len(pending) >= write_batch):
+                cur.executemany(
+                    "UPDATE tracks SET category_slug=?, deezer_genre_id=?, radio_genre_key=? WHERE id=?",
+                    pending,
+                )
+                pending.clear()
+
+        def settle(row, radio_key):
+            track_id, category_slug, deezer_genre_id, new_slug, new_id, existing = row
+            category_changed = (new_slug, new_id) != (category_slug, deezer_genre_id)
+            radio_changed = radio_key is not None and radio_key != existing
+            if category_changed:
+                self.stats["category_updates"] += 1
+            if radio_changed:
+                self.stats["radio_updates"] += 1
+            else:
+                radio_key = existing
+            if category_changed or radio_changed:
+                pending.append((new_slug, new_id, radio_key, track_id))
+
+        last_rowid = 0
+        while True:
+            cur.execute(scan_sql, (last_rowid, chunk_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            last_rowid = rows[-1][0]
+
+            for _, track_id, artist_id, album_id, category_slug, deezer_genre_id, album_genre, existing, target in rows:
+                artist_id = str(artist_id) if artist_id is not None else None
+                album_id = str(album_id) if album_id is not None else None
+                new_slug, new_id = self.category(category_slug, deezer_genre_id, album_id, artist_id)
+
+                # Build from source metadata only; do not feed existing radio_genre_key back
+                # into the model, because previous runs may have baked in bad defaults.
+                key = radio_slug(new_slug) or radio_slug_from_id(new_id) or radio_slug(album_genre)
+                if key:
+                    if album_id:
+                        self.by_album[album_id][key] += 1
+                    if artist_id:
+                        self.by_artist[artist_id][key] += 1
+                if not target:
+                    continue  # only read for the dominance counts
+
+                row = (track_id, category_slug, deezer_genre_id, new_slug, new_id, existing)
+                existing_key = radio_slug(existing)
+                if existing_key and existing_key != "pop":
+                    settle(row, None)
+                elif key and key != "pop":
+                    settle(row, key)
+                else:
+                    # Needs album/artist dominance, which is only known after the scan.
+                    deferred.append((row, album_id, artist_id, key))
+
+            self.stats["scanned"] += len(rows)
+            write()
+            log(f"[{time.time() - started:6.1f}s] scanned {self.stats['scanned']}/{total} tracks")
+
+        album_dom, artist_dom = self.dominance()
+        for row, album_id, artist_id, key in deferred:
+            # If direct key is missing, fill from dominant album/artist.
+            if not key:
+                key = (album_id and album_dom.get(album_id)) or (artist_id and artist_dom.get(artist_id)) or None
+            # If direct key is "pop" but album/artist are strongly non-pop, override.
+            if key == "pop":
+                if album_id and album_dom.get(album_id) and album_dom[album_id] != "pop":
+                    key = album_dom[album_id]
+                elif artist_id and artist_dom.get(artist_id) and artist_dom[artist_id] != "pop":
+                    key = artist_dom[artist_id]
+            settle(row, key)
+            write()
+        write(force=True)
+        self.stats["deferred"] = len(deferred)
+        log(f"[{time.time() - started:6.1f}s] settled {len(deferred)} tracks that needed album/artist dominance")
+
+        if since is not None:
+            for table in SCOPE_TABLES:
+                cur.execute(f"DROP TABLE temp.{table}")
+        state.record(self.mode, watermark, self.settings)
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Resolve category_slug, deezer_genre_id and radio_genre_key in one pass."
+    )
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(__file__), "..", "database", "database.sqlite"))
+    parser.add_argument("--album-share", type=float, default=0.90)
+    parser.add_argument("--artist-share", type=float, default=0.80)
+    parser.add_argument("--min-count", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only revisit albums/artists with tracks or album genres updated since the last run.",
+    )
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    resolver = GenreResolver(args.album_share, args.artist_share, args.min_count)
+    stats = resolver.run(conn, chunk_size=args.chunk_size, incremental=args.incremental)
+    conn.commit()
+    conn.close()
+    print(
+        f"Resolved {stats['targets']} tracks ({stats['scanned']} read): {stats['category_updates']} category updates, "
+        f"{stats['radio_updates']} radio_genre_key updates."
+    )
+
+
+if __name__ == "__main__":
+    main()
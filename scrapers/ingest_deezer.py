@@ -1,101 +1,47 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
+import heapq
 import json
+import math
 import os
 import sqlite3
 import sys
 import time
 import uuid
-from typing import Dict, List, Optional, Sequence, Tuple
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
 
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from app_schema import require_tables
+from deezer_client import DeezerClient
+from deezer_mirror import require_schema as require_mirror_schema, store_payloads
+from genre_resolution import GENRE_FALLBACK_SLUG, extract_genre
+from rate_limiter import RateLimiter
+from response_cache import DEFAULT_PATH as DEFAULT_CACHE_PATH, ResponseCache
 
 BASE_URL = "https://api.deezer.com"
-SESSION: Optional[requests.Session] = None
-GENRE_FALLBACK_SLUG = "unknown"
-GENRE_ID_MAP = {
-    132: "pop",
-    116: "hip-hop",
-    152: "metal",
-    85: "rock",
-    98: "folk-and-acoustic",
-    173: "classical",
-    169: "jazz",
-    113: "dance-electronic",
-    165: "soul",
-    464: "dance-electronic",
-    4642: "latin",
-    52: "metal",
-    1520: "metal",
-    1521: "rock",
-    1522: "rock",
-    1523: "rock",
-    75: "reggae",
-    1324: "country",
-    84: "punk",
-}
-GENRE_NAME_KEYWORDS = [
-    ("metal", "metal"),
-    ("rock", "rock"),
-    ("pop", "pop"),
-    ("hip hop", "hip-hop"),
-    ("hip-hop", "hip-hop"),
-    ("rap", "hip-hop"),
-    ("edm", "dance-electronic"),
-    ("dance", "dance-electronic"),
-    ("electro", "dance-electronic"),
-    ("soul", "soul"),
-    ("r&b", "soul"),
-    ("rnb", "soul"),
-    ("jazz", "jazz"),
-    ("country", "country"),
-    ("folk", "folk-and-acoustic"),
-    ("acoustic", "folk-and-acoustic"),
-    ("classical", "classical"),
-    ("latin", "latin"),
-    ("reggae", "reggae"),
-    ("blues", "blues"),
-    ("punk", "punk"),
-]
+CLIENT: Optional[DeezerClient] = None
 
 
 def timestamp() -> str:
     return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
 
 
-def make_session() -> requests.Session:
-    s = requests.Session()
-    retries = Retry(
-        total=5, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504)
-    )
-    s.mount("https://", HTTPAdapter(max_retries=retries))
-    return s
-
+def api_get(path: str, params: Optional[Dict] = None, refresh: bool = False) -> dict:
+    global CLIENT
+    if CLIENT is None:
+        CLIENT = DeezerClient(base_url=BASE_URL, limiter=RateLimiter(), cache=ResponseCache())
+    return CLIENT.get(path, params, refresh)
 
-def api_get(path: str, params: Optional[Dict] = None) -> dict:
-    global SESSION
-    if SESSION is None:
-        SESSION = make_session()
-    url = f"{BASE_URL.rstrip('/')}/{path.lstrip('/')}"
-    resp = SESSION.get(url, params=params or {}, timeout=20)
-    resp.raise_for_status()
-    return resp.json()
 
-
-def search_artist_by_name(name: str) -> Optional[dict]:
-    payload = api_get("search/artist", {"q": name, "limit": 1})
-    items = payload.get("data") or []
-    return items[0] if items else None
-
-
-def get_artist_by_id(artist_id: str) -> Optional[dict]:
-    try:
-        return api_get(f"artist/{artist_id}")
-    except requests.HTTPError:
-        return None
+def api_get_many(requests: Sequence[Tuple[str, Optional[Dict]]]) -> List:
+    """Concurrent api_get; failures come back in place as exceptions."""
+    global CLIENT
+    if CLIENT is None:
+        CLIENT = DeezerClient(base_url=BASE_URL, limiter=RateLimiter(), cache=ResponseCache())
+    return CLIENT.get_many(requests)
 
 
 def get_related_artists(artist_id: str, limit: int) -> List[dict]:
@@ -103,89 +49,186 @@ def get_related_artists(artist_id: str, limit: int) -> List[dict]:
     return data.get("data") or []
 
 
-def get_artist_top_tracks(artist_id: str, limit: int) -> List[dict]:
-    data = api_get(f"artist/{artist_id}/top", {"limit": limit})
-    return data.get("data") or []
+def get_artist(artist_id: str) -> dict:
+    return api_get(f"artist/{artist_id}")
 
 
-def get_artist_albums(artist_id: str, limit: int) -> List[dict]:
-    data = api_get(f"artist/{artist_id}/albums", {"limit": limit})
+def get_artist_top_tracks(artist_id: str, limit: int, refresh: bool = False) -> List[dict]:
+    data = api_get(f"artist/{artist_id}/top", {"limit": limit}, refresh)
     return data.get("data") or []
 
 
-def normalize_genre_id(value) -> Optional[int]:
-    if value is None:
-        return None
-    try:
-        genre_id = int(value)
-        return genre_id if genre_id > 0 else None
-    except (TypeError, ValueError):
-        return None
-
-
-def slug_from_name(name: str) -> Optional[str]:
-    if not name:
-        return None
-    lowered = name.lower()
-    for keyword, slug in GENRE_NAME_KEYWORDS:
-        if keyword in lowered:
-            return slug
-    return None
-
-
-def map_genre_id(genre_id: Optional[int]) -> str:
-    if genre_id is None:
-        return GENRE_FALLBACK_SLUG
-    return GENRE_ID_MAP.get(genre_id, GENRE_FALLBACK_SLUG)
-
-
-def extract_genre(
-    track: Optional[dict],
-    album: Optional[dict],
-    artist: Optional[dict],
-) -> Tuple[Optional[int], str]:
-    ids: List[int] = []
-    names: List[str] = []
-
-    def gather(obj: Optional[dict]):
-        if not obj:
-            return
-        gid = normalize_genre_id(obj.get("genre_id"))
-        if gid is not None:
-            ids.append(gid)
-        genres = (obj.get("genres") or {}).get("data") or []
-        for item in genres:
-            gid = normalize_genre_id(item.get("id"))
-            if gid is not None:
-                ids.append(gid)
-            name = item.get("name")
-            if name:
-                names.append(name)
-
-    gather(track)
-    gather(album)
-    gather(artist)
+def get_artist_albums(artist_id: str, limit: int, refresh: bool = False) -> List[dict]:
+    data = api_get(f"artist/{artist_id}/albums", {"limit": limit}, refresh)
+    return data.get("data") or []
 
-    slug = None
-    for name in names:
-        slug = slug_from_name(name)
-        if slug:
-            break
 
-    if slug is None:
-        for gid in ids:
-            slug = map_genre_id(gid)
-            if slug and slug != GENRE_FALLBACK_SLUG:
-                break
+UPSERT_ARTIST_SQL = """
+    INSERT INTO artists (id, name, image_url, monthly_listeners, is_verified, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        name=excluded.name,
+        image_url=COALESCE(NULLIF(artists.image_url,''), excluded.image_url),
+        monthly_listeners=excluded.monthly_listeners,
+        is_verified=excluded.is_verified,
+        updated_at=excluded.updated_at
+"""
+
+# Used once the deezer_artist_id migration has run; a stored id is never replaced.
+UPSERT_ARTIST_WITH_DEEZER_ID_SQL = """
+    INSERT INTO artists (id, name, image_url, monthly_listeners, is_verified, created_at, updated_at, deezer_artist_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        name=excluded.name,
+        image_url=COALESCE(NULLIF(artists.image_url,''), excluded.image_url),
+        monthly_listeners=excluded.monthly_listeners,
+        is_verified=excluded.is_verified,
+        updated_at=excluded.updated_at,
+        deezer_artist_id=COALESCE(artists.deezer_artist_id, excluded.deezer_artist_id)
+"""
+
+# The WHERE keeps the old INSERT OR IGNORE behaviour when a Deezer album id
+# already belongs to another artist.
+UPSERT_ALBUM_SQL = """
+    INSERT INTO albums (id, name, artist_id, image_url, release_date, genre, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        name=excluded.name,
+        image_url=COALESCE(NULLIF(albums.image_url,''), excluded.image_url),
+        release_date=excluded.release_date,
+        genre=excluded.genre,
+        updated_at=excluded.updated_at
+    WHERE albums.artist_id = excluded.artist_id
+"""
+
+UPSERT_TRACK_SQL = """
+    INSERT INTO tracks (id, name, artist_id, album_id, duration, audio_url, category_slug, deezer_genre_id, created_at, updated_at, deezer_track_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        name=excluded.name,
+        artist_id=excluded.artist_id,
+        album_id=excluded.album_id,
+        duration=excluded.duration,
+        audio_url=excluded.audio_url,
+        category_slug=excluded.category_slug,
+        deezer_genre_id=excluded.deezer_genre_id,
+        updated_at=excluded.updated_at,
+        deezer_track_id=excluded.deezer_track_id
+"""
+
+
+class IdentityMap:
+    """
+    Case-folded lookups for rows already in the database, kept in memory so
+    ingest never scans tables with lower(name)=lower(?). Artist names, Deezer
+    artist ids and Deezer track ids are preloaded. Albums and track names are
+    loaded per artist (via the artist_id index) the first time that artist is
+    written.
+    """
+
+    def __init__(self, cur):
+        self.has_deezer_artist_id = has_column(cur, "artists", "deezer_artist_id")
+        self.artists: Dict[str, str] = {}
+        self.deezer_artists: Dict[str, str] = {}
+        self.artist_deezer_ids: Dict[str, str] = {}
+        deezer_column = "deezer_artist_id" if self.has_deezer_artist_id else "NULL"
+        cur.execute(f"SELECT id, name, {deezer_column} FROM artists")
+        for artist_id, name, deezer_artist_id in cur.fetchall():
+            if name:
+                self.artists.setdefault(name.lower(), artist_id)
+            if deezer_artist_id:
+                self.deezer_artists.setdefault(str(deezer_artist_id), artist_id)
+                self.artist_deezer_ids[artist_id] = str(deezer_artist_id)
+
+        self.deezer_tracks: Dict[str, str] = {}
+        cur.execute("SELECT id, deezer_track_id FROM tracks WHERE deezer_track_id IS NOT NULL")
+        for track_id, deezer_track_id in cur.fetchall():
+            self.deezer_tracks.setdefault(deezer_track_id, track_id)
+
+        self.albums: Dict[str, Dict[str, Tuple[str, str]]] = {}
+        self.tracks: Dict[str, Dict[str, Tuple[str, str]]] = {}
+
+    def albums_for(self, cur, artist_id: str) -> Dict[str, Tuple[str, str]]:
+        if artist_id not in self.albums:
+            cur.execute(
+                "SELECT id, name, image_url FROM albums WHERE artist_id=?", (artist_id,)
+            )
+            albums: Dict[str, Tuple[str, str]] = {}
+            for album_id, name, image in cur.fetchall():
+                albums.setdefault(name.lower(), (album_id, image))
+            self.albums[artist_id] = albums
+        return self.albums[artist_id]
+
+    def tracks_for(self, cur, artist_id: str) -> Dict[str, Tuple[str, str]]:
+        if artist_id not in self.tracks:
+            cur.execute("SELECT id, name FROM tracks WHERE artist_id=?", (artist_id,))
+            tracks: Dict[str, Tuple[str, str]] = {}
+            for track_id, name in cur.fetchall():
+                tracks.setdefault(name.lower(), (track_id, name))
+            self.tracks[artist_id] = tracks
+        return self.tracks[artist_id]
+
+    def absorb(self, batch: "ArtistBatch"):
+        """Record a batch once its rows have been written."""
+        self.artists.setdefault(batch.artist_name.lower(), batch.artist_id)
+        if batch.deezer_artist_id and batch.artist_id not in self.artist_deezer_ids:
+            self.deezer_artists.setdefault(batch.deezer_artist_id, batch.artist_id)
+            self.artist_deezer_ids[batch.artist_id] = batch.deezer_artist_id
+        self.albums[batch.artist_id] = batch.albums_by_name
+        self.tracks[batch.artist_id] = batch.tracks_by_name
+        self.deezer_tracks.update(batch.new_deezer_tracks)
+
+
+class ArtistBatch:
+    """
+    Rows for one artist, resolved against the identity map and written with
+    one executemany per table instead of a SELECT + UPDATE/INSERT per row.
+    Lookups made while staging go into copies, so a failed artist leaves the
+    identity map untouched.
+    """
+
+    def __init__(
+        self, cur, identity: IdentityMap, artist_name: str, deezer_artist_id: Optional[str] = None
+    ):
+        self.identity = identity
+        self.artist_name = artist_name
+        self.deezer_artist_id = deezer_artist_id
+        artist_id = deezer_artist_id and identity.deezer_artists.get(deezer_artist_id)
+        if not artist_id:
+            artist_id = identity.artists.get(artist_name.lower())
+            # A same-named row that already belongs to another Deezer artist is someone else.
+            known = identity.artist_deezer_ids.get(artist_id) if artist_id else None
+            if known and deezer_artist_id and known != deezer_artist_id:
+                artist_id = None
+        self.artist_id = artist_id or str(uuid.uuid4())
+        self.artist_row: Optional[tuple] = None
+        self.album_rows: Dict[str, list] = {}
+        self.track_rows: Dict[str, list] = {}
+        self.albums_by_name = dict(identity.albums_for(cur, self.artist_id))
+        self.tracks_by_name = dict(identity.tracks_for(cur, self.artist_id))
+        self.new_deezer_tracks: Dict[str, str] = {}
+        self.new_track_genres: List[str] = []
+
+    def track_id_for_deezer_id(self, deezer_track_id: str) -> Optional[str]:
+        return self.new_deezer_tracks.get(deezer_track_id) or self.identity.deezer_tracks.get(
+            deezer_track_id
+        )
 
-    if slug is None:
-        slug = GENRE_FALLBACK_SLUG
+    def dominant_genre(self) -> Optional[str]:
+        slugs = [row[6] for row in self.track_rows.values() if row[6] != GENRE_FALLBACK_SLUG]
+        return max(set(slugs), key=slugs.count) if slugs else None
 
-    genre_id = ids[0] if ids else None
-    return genre_id, slug
+    def flush(self, cur):
+        if self.artist_row is not None:
+            if self.identity.has_deezer_artist_id:
+                cur.execute(UPSERT_ARTIST_WITH_DEEZER_ID_SQL, self.artist_row)
+            else:
+                cur.execute(UPSERT_ARTIST_SQL, self.artist_row[:-1])
+        cur.executemany(UPSERT_ALBUM_SQL, self.album_rows.values())
+        cur.executemany(UPSERT_TRACK_SQL, self.track_rows.values())
 
 
-def ensure_artist(cur, artist: dict) -> str:
+def ensure_artist(batch: ArtistBatch, artist: dict):
     name = artist.get("name") or "Unknown Artist"
     image = (
         artist.get("picture_big")
@@ -195,34 +238,11 @@ def ensure_artist(cur, artist: dict) -> str:
     )
     monthly = int(artist.get("nb_fan") or 0)
     is_verified = 1 if artist.get("radio") else 0
+    now = timestamp()
+    batch.artist_row = (batch.artist_id, name, image, monthly, is_verified, now, now, batch.deezer_artist_id)
 
-    cur.execute("SELECT id FROM artists WHERE lower(name)=lower(?)", (name,))
-    row = cur.fetchone()
-    if row:
-        artist_id = row[0]
-        cur.execute(
-            """
-            UPDATE artists
-            SET name=?, image_url=COALESCE(NULLIF(image_url,''), ?),
-                monthly_listeners=?, is_verified=?, updated_at=?
-            WHERE id=?
-            """,
-            (name, image, monthly, is_verified, timestamp(), artist_id),
-        )
-        return artist_id
-
-    artist_id = str(uuid.uuid4())
-    cur.execute(
-        """
-        INSERT INTO artists (id, name, image_url, monthly_listeners, is_verified, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        (artist_id, name, image, monthly, is_verified, timestamp(), timestamp()),
-    )
-    return artist_id
 
-
-def ensure_album(cur, album: dict, artist_id: str, genre_slug: str) -> str:
+def ensure_album(batch: ArtistBatch, album: dict, genre_slug: str) -> str:
     name = album.get("title") or "Unknown Album"
     cover = (
         album.get("cover_big")
@@ -231,49 +251,32 @@ def ensure_album(cur, album: dict, artist_id: str, genre_slug: str) -> str:
         or f"https://placehold.co/600x600/333/fff?text={name}"
     )
     release_date = album.get("release_date") or "2000-01-01"
-
-    cur.execute(
-        "SELECT id, image_url FROM albums WHERE lower(name)=lower(?) AND artist_id=?",
-        (name, artist_id),
-    )
-    row = cur.fetchone()
-    if row:
-        album_id, current_cover = row
-        chosen_cover = current_cover or cover
-        cur.execute(
-            """
-            UPDATE albums
-            SET name=?, image_url=?, release_date=?, genre=?, updated_at=?
-            WHERE id=?
-            """,
-            (name, chosen_cover, release_date, genre_slug, timestamp(), album_id),
-        )
-        return album_id
-
-    album_id = str(album.get("id") or uuid.uuid4())
-    cur.execute(
-        """
-        INSERT OR IGNORE INTO albums (id, name, artist_id, image_url, release_date, genre, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            album_id,
-            name,
-            artist_id,
-            cover,
-            release_date,
-            genre_slug,
-            timestamp(),
-            timestamp(),
-        ),
-    )
+    now = timestamp()
+
+    existing = batch.albums_by_name.get(name.lower())
+    if existing:
+        album_id, current_cover = existing
+        cover = current_cover or cover
+    else:
+        album_id = str(album.get("id") or uuid.uuid4())
+        batch.albums_by_name[name.lower()] = (album_id, cover)
+
+    batch.album_rows[album_id] = [
+        album_id,
+        name,
+        batch.artist_id,
+        cover,
+        release_date,
+        genre_slug,
+        now,
+        now,
+    ]
     return album_id
 
 
 def ensure_track(
-    cur,
+    batch: ArtistBatch,
     track: dict,
-    artist_id: str,
     album_id: str,
     genre_slug: str,
     genre_id: Optional[int],
@@ -283,91 +286,58 @@ def ensure_track(
     duration = int(track.get("duration") or 0)
     audio = track.get("preview") or ""
     genre_id_str = str(genre_id) if genre_id is not None else None
-
-    cur.execute("SELECT id FROM tracks WHERE deezer_track_id=?", (deezer_track_id,))
-    row = cur.fetchone()
-    if row:
-        track_id = row[0]
-        cur.execute(
-            """
-            UPDATE tracks
-            SET name=?, artist_id=?, album_id=?, duration=?, audio_url=?, category_slug=?, deezer_genre_id=?, updated_at=?
-            WHERE id=?
-            """,
-            (
-                name,
-                artist_id,
-                album_id,
-                duration,
-                audio,
-                genre_slug,
-                genre_id_str,
-                timestamp(),
-                track_id,
-            ),
-        )
-        return
-
-    cur.execute(
-        "SELECT id FROM tracks WHERE lower(name)=lower(?) AND artist_id=?",
-        (name, artist_id),
-    )
-    row = cur.fetchone()
-    if row:
-        track_id = row[0]
-        cur.execute(
-            """
-            UPDATE tracks
-            SET deezer_track_id=?, album_id=?, duration=?, audio_url=?, category_slug=?, deezer_genre_id=?, updated_at=?
-            WHERE id=?
-            """,
-            (
-                deezer_track_id,
-                album_id,
-                duration,
-                audio,
-                genre_slug,
-                genre_id_str,
-                timestamp(),
-                track_id,
-            ),
-        )
-        return
-
-    track_id = str(uuid.uuid4())
-    cur.execute(
-        """
-        INSERT INTO tracks (id, name, artist_id, album_id, duration, audio_url, category_slug, deezer_genre_id, created_at, updated_at, deezer_track_id)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            track_id,
-            name,
-            artist_id,
-            album_id,
-            duration,
-            audio,
-            genre_slug,
-            genre_id_str,
-            timestamp(),
-            timestamp(),
-            deezer_track_id,
-        ),
-    )
-
-
-def ingest_artist(cur, artist_obj: dict, tracks_per_artist: int, albums_per_artist: int, related_depth: int):
-    artist_id = ensure_artist(cur, artist_obj)
+    now = timestamp()
+
+    track_id = batch.track_id_for_deezer_id(deezer_track_id)
+    if track_id is None:
+        existing = batch.tracks_by_name.get(name.lower())
+        if existing:
+            # Matched by name only: link the Deezer id but keep the stored title.
+            track_id, name = existing
+        else:
+            track_id = str(uuid.uuid4())
+            batch.tracks_by_name[name.lower()] = (track_id, name)
+            batch.new_track_genres.append(genre_slug)
+        batch.new_deezer_tracks[deezer_track_id] = track_id
+
+    batch.track_rows[track_id] = [
+        track_id,
+        name,
+        batch.artist_id,
+        album_id,
+        duration,
+        audio,
+        genre_slug,
+        genre_id_str,
+        now,
+        now,
+        deezer_track_id,
+    ]
+
+
+def write_artist(
+    cur,
+    identity: IdentityMap,
+    artist_obj: dict,
+    albums: List[dict],
+    top_tracks: List[dict],
+) -> ArtistBatch:
+    """Apply already-fetched Deezer payloads for one artist to the database."""
+    # Raw payloads go to the local mirror the matching scripts search first.
+    store_payloads(cur, artist_obj, albums, top_tracks)
+    deezer_artist_id = str(artist_obj["id"]) if artist_obj.get("id") else None
+    batch = ArtistBatch(cur, identity, artist_obj.get("name") or "Unknown Artist", deezer_artist_id)
+    ensure_artist(batch, artist_obj)
     artist_genre_id, artist_slug = extract_genre(None, None, artist_obj)
 
     album_map: Dict[str, Tuple[str, dict, Optional[int], str]] = {}
-    for album_obj in get_artist_albums(str(artist_obj["id"]), limit=albums_per_artist):
+    for album_obj in albums:
         album_genre_id, album_slug = extract_genre(None, album_obj, artist_obj)
         if album_slug == GENRE_FALLBACK_SLUG:
             album_slug = artist_slug
         if album_genre_id is None:
             album_genre_id = artist_genre_id
-        album_local_id = ensure_album(cur, album_obj, artist_id, album_slug)
+        album_local_id = ensure_album(batch, album_obj, album_slug)
         if album_obj.get("id"):
             album_map[str(album_obj["id"])] = (
                 album_local_id,
@@ -376,7 +346,7 @@ def ingest_artist(cur, artist_obj: dict, tracks_per_artist: int, albums_per_arti
                 album_slug,
             )
 
-    for track_obj in get_artist_top_tracks(str(artist_obj["id"]), limit=tracks_per_artist):
+    for track_obj in top_tracks:
         album_ref = track_obj.get("album") or {}
         deezer_album_id = album_ref.get("id")
         album_data = album_map.get(str(deezer_album_id))
@@ -388,13 +358,12 @@ def ingest_artist(cur, artist_obj: dict, tracks_per_artist: int, albums_per_arti
         if not album_local_id:
             fallback_album_slug = album_slug or artist_slug
             album_local_id = ensure_album(
-                cur,
+                batch,
                 {
                     "id": deezer_album_id or uuid.uuid4(),
                     "title": album_ref.get("title") or track_obj.get("title"),
                     "cover": album_ref.get("cover"),
                 },
-                artist_id,
                 fallback_album_slug,
             )
             album_genre_id = album_genre_id or artist_genre_id
@@ -406,10 +375,363 @@ def ingest_artist(cur, artist_obj: dict, tracks_per_artist: int, albums_per_arti
         if genre_id is None:
             genre_id = album_genre_id or artist_genre_id
 
-        ensure_track(cur, track_obj, artist_id, album_local_id, genre_slug, genre_id)
+        ensure_track(batch, track_obj, album_local_id, genre_slug, genre_id)
+
+    batch.flush(cur)
+    return batch
+
+
+FETCH_PARTS = ("albums", "top", "related")
+
+
+def submit_artist_fetches(
+    pool: ThreadPoolExecutor,
+    artist_obj: dict,
+    args,
+    parts: Sequence[str] = FETCH_PARTS,
+    refresh: bool = False,
+) -> Dict[str, Future]:
+    """
+    Fetch artist details, albums, top tracks and/or related artists for one
+    artist concurrently. refresh=True bypasses cached albums and top tracks.
+    """
+    deezer_artist_id = str(artist_obj["id"])
+    fetchers = {
+        "artist": (get_artist,),
+        "albums": (get_artist_albums, args.albums_per_artist, refresh),
+        "top": (get_artist_top_tracks, args.tracks_per_artist, refresh),
+        "related": (get_related_artists, args.related_depth),
+    }
+    return {
+        part: pool.submit(fetchers[part][0], deezer_artist_id, *fetchers[part][1:])
+        for part in parts
+    }
+
+
+def artist_fingerprint(artist_obj: dict, top_tracks: List[dict]) -> str:
+    """Cheap change signal: album count, order of magnitude of fans, top-track ids."""
+    fans = int(artist_obj.get("nb_fan") or 0)
+    payload = {
+        "nb_album": artist_obj.get("nb_album"),
+        "fan_bucket": int(math.log2(fans + 1)),
+        "top": sorted(str(t.get("id")) for t in top_tracks),
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class CrawlState:
+    """Per-artist fingerprint and last crawl time, kept in artist_crawl_state."""
+
+    def __init__(self, cur):
+        require_tables(cur, "artist_crawl_state")
+        cur.execute("SELECT deezer_artist_id, fingerprint, crawled_at FROM artist_crawl_state")
+        self.rows: Dict[str, Tuple[str, float]] = {
+            deezer_artist_id: (fingerprint, crawled_at)
+            for deezer_artist_id, fingerprint, crawled_at in cur.fetchall()
+        }
+
+    def is_fresh(self, deezer_artist_id: str, fingerprint: str, ttl_seconds: float) -> bool:
+        row = self.rows.get(deezer_artist_id)
+        if row is None:
+            return False
+        known_fingerprint, crawled_at = row
+        return known_fingerprint == fingerprint and time.time() - crawled_at < ttl_seconds
+
+    def record(self, cur, deezer_artist_id: str, fingerprint: str):
+        now = time.time()
+        cur.execute(
+            """
+            INSERT INTO artist_crawl_state (deezer_artist_id, fingerprint, crawled_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(deezer_artist_id) DO UPDATE SET
+                fingerprint=excluded.fingerprint, crawled_at=excluded.crawled_at
+            """,
+            (deezer_artist_id, fingerprint, now),
+        )
+        self.rows[deezer_artist_id] = (fingerprint, now)
+
+
+# Fields ensure_artist() and the priority score need; the rest is dropped.
+CHECKPOINT_ARTIST_KEYS = (
+    "id",
+    "name",
+    "picture_big",
+    "picture_medium",
+    "picture",
+    "nb_fan",
+    "nb_album",
+    "radio",
+    "genre_id",
+    "genres",
+)
+
+
+def artist_key(artist_obj: dict) -> str:
+    return str(artist_obj.get("id") or artist_obj.get("name", ""))
+
+
+class Frontier:
+    """FIFO crawl frontier with O(1) pops and dedupe on artist keys."""
+
+    def __init__(self):
+        self._queue: Deque[Tuple[dict, int, Optional[str]]] = deque()
+        self._queued: set = set()
+
+    def push(self, artist_obj: dict, depth: int = 0, genre_hint: Optional[str] = None) -> bool:
+        key = artist_key(artist_obj)
+        if not key or key in self._queued:
+            return False
+        self._queued.add(key)
+        self._queue.append((artist_obj, depth, genre_hint))
+        return True
+
+    def pop(self) -> Tuple[dict, int]:
+        artist_obj, depth, _ = self._queue.popleft()
+        self._queued.discard(artist_key(artist_obj))
+        return artist_obj, depth
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+
+class GenreCoverage:
+    """Track counts per category_slug, used to favour under-represented genres."""
+
+    def __init__(self, cur):
+        cur.execute("SELECT category_slug, COUNT(*) FROM tracks GROUP BY category_slug")
+        self.counts: Dict[str, int] = {slug: n for slug, n in cur.fetchall() if slug}
+        self.total = sum(self.counts.values())
+
+    def add(self, slugs: Sequence[str]):
+        for slug in slugs:
+            self.counts[slug] = self.counts.get(slug, 0) + 1
+            self.total += 1
+
+    def rarity(self, slug: Optional[str]) -> float:
+        if not slug or slug == GENRE_FALLBACK_SLUG:
+            return 0.5  # no evidence either way
+        if not self.total:
+            return 1.0
+        return 1.0 - self.counts.get(slug, 0) / self.total
+
+
+# Priority weights: popularity and genre gaps both count, and each hop away
+# from the seeds discounts the candidate.
+FAN_WEIGHT = 0.6
+GENRE_WEIGHT = 0.4
+DEPTH_DECAY = 0.85
+FAN_SCALE = 7.0  # log10(10M fans)
+
+
+class PriorityFrontier(Frontier):
+    """
+    Best-first frontier: always expands the highest-value artist next.
+
+    Scores combine nb_fan, depth from the seeds and how rare the artist's
+    genre (or, failing that, the genre of the artist that linked to it) is in
+    the catalogue. Coverage shifts as the crawl writes tracks, so a popped
+    entry is re-scored and pushed back if it no longer beats the next best.
+    """
+
+    def __init__(self, coverage: GenreCoverage):
+        super().__init__()
+        self.coverage = coverage
+        self._heap: List[Tuple[float, int, dict, int, Optional[str]]] = []
+        self._counter = 0
+
+    def score(self, artist_obj: dict, depth: int, genre_hint: Optional[str]) -> float:
+        fans = min(1.0, math.log10(1 + int(artist_obj.get("nb_fan") or 0)) / FAN_SCALE)
+        _, slug = extract_genre(None, None, artist_obj)
+        if slug == GENRE_FALLBACK_SLUG:
+            slug = genre_hint
+        value = FAN_WEIGHT * fans + GENRE_WEIGHT * self.coverage.rarity(slug)
+        return value * (DEPTH_DECAY ** depth)
+
+    def push(self, artist_obj: dict, depth: int = 0, genre_hint: Optional[str] = None) -> bool:
+        key = artist_key(artist_obj)
+        if not key or key in self._queued:
+            return False
+        self._queued.add(key)
+        self._push_entry(artist_obj, depth, genre_hint)
+        return True
+
+    def _push_entry(self, artist_obj: dict, depth: int, genre_hint: Optional[str]):
+        self._counter += 1
+        score = self.score(artist_obj, depth, genre_hint)
+        heapq.heappush(self._heap, (-score, self._counter, artist_obj, depth, genre_hint))
+
+    def pop(self) -> Tuple[dict, int]:
+        while True:
+            neg_score, _, artist_obj, depth, genre_hint = heapq.heappop(self._heap)
+            current = self.score(artist_obj, depth, genre_hint)
+            if not self._heap or current >= -self._heap[0][0] or current >= -neg_score:
+                self._queued.discard(artist_key(artist_obj))
+                return artist_obj, depth
+            self._push_entry(artist_obj, depth, genre_hint)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class CrawlCheckpoint:
+    """
+    Append-only resume log. Each line is either {"q": artist, "d": depth,
+    "g": genre hint} when an artist joins the frontier or {"v": key} once it
+    has been visited and committed.
+    Replaying the log gives back the visited set and the pending queue, and
+    the file is compacted on load so it doesn't grow without bound across runs.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pending: List[str] = []
+        self._file = None
+
+    def load(self) -> Optional[Tuple[set, List[Tuple[dict, int, Optional[str]]]]]:
+        if not os.path.exists(self.path):
+            return None
+        visited: set = set()
+        queued: Dict[str, Tuple[dict, int, Optional[str]]] = {}
+        with open(self.path, "r") as f:
+            text = f.read()
+        try:
+            # Legacy format: one JSON blob holding full visited + queue lists.
+            legacy = json.loads(text)
+        except ValueError:
+            legacy = None
+        if isinstance(legacy, dict) and "visited" in legacy:
+            visited = set(legacy.get("visited") or [])
+            for artist_obj in legacy.get("queue") or []:
+                queued.setdefault(artist_key(artist_obj), (artist_obj, 0, None))
+        else:
+            for line in text.splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from an interrupted write
+                if "v" in entry:
+                    visited.add(entry["v"])
+                elif "q" in entry:
+                    queued.setdefault(
+                        artist_key(entry["q"]), (entry["q"], entry.get("d", 0), entry.get("g"))
+                    )
+        queue = [item for key, item in queued.items() if key not in visited]
+        self._compact(visited, queue)
+        return visited, queue
+
+    def _compact(self, visited: set, queue: List[Tuple[dict, int, Optional[str]]]):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            for key in visited:
+                f.write(json.dumps({"v": key}) + "\n")
+            for artist_obj, depth, genre_hint in queue:
+                f.write(self._queued_line(artist_obj, depth, genre_hint) + "\n")
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _compact_artist(artist_obj: dict) -> dict:
+        return {k: artist_obj[k] for k in CHECKPOINT_ARTIST_KEYS if k in artist_obj}
+
+    @classmethod
+    def _queued_line(cls, artist_obj: dict, depth: int, genre_hint: Optional[str]) -> str:
+        return json.dumps({"q": cls._compact_artist(artist_obj), "d": depth, "g": genre_hint})
+
+    def queued(self, artist_obj: dict, depth: int = 0, genre_hint: Optional[str] = None):
+        self._pending.append(self._queued_line(artist_obj, depth, genre_hint))
+
+    def visited(self, key: str):
+        self._pending.append(json.dumps({"v": key}))
+
+    def flush(self):
+        if not self._pending:
+            return
+        if self._file is None:
+            self._file = open(self.path, "a")
+        self._file.write("\n".join(self._pending) + "\n")
+        self._file.flush()
+        self._pending.clear()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+SEED_FETCH_CHUNK = 200
+
+
+def has_column(cur, table: str, column: str) -> bool:
+    cur.execute(f"PRAGMA table_info({table})")
+    return column in {row[1] for row in cur.fetchall()}
+
+
+def mirrored_artists(cur, deezer_ids: Sequence[str]) -> Dict[str, dict]:
+    """Artist payloads stored by earlier crawls, keyed by Deezer id."""
+    found: Dict[str, dict] = {}
+    numeric = [int(i) for i in deezer_ids if str(i).isdigit()]
+    for start in range(0, len(numeric), 900):
+        chunk = numeric[start:start + 900]
+        cur.execute(
+            f"SELECT id, payload FROM deezer_mirror_artists WHERE id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        )
+        for deezer_id, payload in cur.fetchall():
+            found[str(deezer_id)] = json.loads(payload)
+    return found
+
+
+def mirrored_artists_by_name(cur, names: Sequence[str]) -> Dict[str, dict]:
+    """Stored artist payloads for the given case-folded names."""
+    wanted = set(names)
+    if not wanted:
+        return {}
+    ids: Dict[str, str] = {}
+    cur.execute("SELECT id, name FROM deezer_mirror_artists ORDER BY fetched_at DESC")
+    for deezer_id, name in cur.fetchall():
+        key = (name or "").lower()
+        if key in wanted:
+            ids.setdefault(key, str(deezer_id))
+    payloads = mirrored_artists(cur, list(ids.values()))
+    return {key: payloads[i] for key, i in ids.items() if i in payloads}
+
+
+def fetch_many(requests: Sequence[Tuple[str, Optional[Dict]]], label: str) -> List:
+    """api_get_many in chunks, with progress for long seed lists."""
+    results: List = []
+    for start in range(0, len(requests), SEED_FETCH_CHUNK):
+        results.extend(api_get_many(requests[start:start + SEED_FETCH_CHUNK]))
+        if len(requests) > SEED_FETCH_CHUNK:
+            print(f"  {label}: {len(results)}/{len(requests)}")
+    return results
+
+
+def fetch_artists_by_id(deezer_ids: Sequence[str]) -> Dict[str, dict]:
+    found: Dict[str, dict] = {}
+    results = fetch_many([(f"artist/{i}", None) for i in deezer_ids], "artists fetched by id")
+    for deezer_id, result in zip(deezer_ids, results):
+        if isinstance(result, dict) and result.get("id"):
+            found[deezer_id] = result
+    return found
+
+
+def search_artists_by_name(names: Sequence[str]) -> Dict[str, dict]:
+    """First search hit per name, keyed by the case-folded name."""
+    found: Dict[str, dict] = {}
+    results = fetch_many([("search/artist", {"q": name, "limit": 1}) for name in names], "artist searches")
+    for name, result in zip(names, results):
+        if isinstance(result, dict) and result.get("data"):
+            found[name.lower()] = result["data"][0]
+    return found
 
 
 def build_seed_lists(args, cur) -> Sequence[dict]:
+    """
+    Resolve seed artists. Stored Deezer ids are used as they are: the payload
+    from the local mirror when there is one, otherwise a concurrent
+    /artist/{id} fetch. Names are only searched for rows without a usable id,
+    and the ids found are saved on the artist rows for next time.
+    """
     seeds: List[dict] = []
     processed_names: set[str] = set()
 
@@ -422,20 +744,64 @@ def build_seed_lists(args, cur) -> Sequence[dict]:
         processed_names.add(name)
         seeds.append(artist_obj)
 
-    seed_names = [s.strip() for s in (args.seeds or "").split(",") if s.strip()]
+    # (deezer id, name, local artist id) in seed order.
+    entries: List[Tuple[Optional[str], Optional[str], Optional[str]]] = [
+        (None, s.strip(), None) for s in (args.seeds or "").split(",") if s.strip()
+    ]
+    has_deezer_id = has_column(cur, "artists", "deezer_artist_id")
     if args.use_existing:
-        cur.execute("SELECT DISTINCT name FROM artists WHERE name IS NOT NULL")
-        for (name,) in cur.fetchall():
-            if name:
-                seed_names.append(name)
-
-    for name in seed_names:
-        maybe_add(search_artist_by_name(name))
-
-    artist_ids = [s.strip() for s in (args.artist_ids or "").split(",") if s.strip()]
-    for artist_id in artist_ids:
-        maybe_add(get_artist_by_id(artist_id))
+        deezer_column = "deezer_artist_id" if has_deezer_id else "NULL"
+        cur.execute(f"SELECT id, name, {deezer_column} FROM artists WHERE name IS NOT NULL")
+        for local_id, name, deezer_artist_id in cur.fetchall():
+            entries.append((str(deezer_artist_id) if deezer_artist_id else None, name, local_id))
+    entries.extend(
+        (s.strip(), None, None) for s in (args.artist_ids or "").split(",") if s.strip()
+    )
 
+    ids = list(dict.fromkeys(deezer_id for deezer_id, _, _ in entries if deezer_id))
+    by_id = {} if args.refresh_seeds else mirrored_artists(cur, ids)
+    from_mirror = len(by_id)
+    missing = [i for i in ids if i not in by_id]
+    by_id.update(fetch_artists_by_id(missing))
+    fetched = len(by_id) - from_mirror
+
+    # Name search only for rows without an id, or whose id no longer resolves.
+    names = list(dict.fromkeys(
+        name.lower() for deezer_id, name, _ in entries if name and deezer_id not in by_id
+    ))
+    by_name = {} if args.refresh_seeds else mirrored_artists_by_name(cur, names)
+    named_from_mirror = len(by_name)
+    spelled = {name.lower(): name for _, name, _ in entries if name}
+    by_name.update(search_artists_by_name([spelled[n] for n in names if n not in by_name]))
+
+    # A search hit's id is only saved when the names agree and no row owns it yet,
+    # since ingest resolves artists by this id before their name.
+    owned = {deezer_id for deezer_id, _, local_id in entries if deezer_id and local_id}
+    learned = []
+    for deezer_id, name, local_id in entries:
+        artist_obj = by_id.get(deezer_id) if deezer_id else None
+        if artist_obj is None and name:
+            artist_obj = by_name.get(name.lower())
+            found_id = str(artist_obj.get("id") or "") if artist_obj else ""
+            if (
+                found_id
+                and local_id
+                and not deezer_id
+                and found_id not in owned
+                and (artist_obj.get("name") or "").lower() == name.lower()
+            ):
+                owned.add(found_id)
+                learned.append((found_id, local_id))
+        maybe_add(artist_obj)
+
+    if has_deezer_id and learned:
+        cur.executemany(
+            "UPDATE artists SET deezer_artist_id=? WHERE id=? AND deezer_artist_id IS NULL", learned
+        )
+    print(
+        f"Resolved seeds: {from_mirror} ids from the local mirror, {fetched} fetched by id, "
+        f"{named_from_mirror} names from the local mirror, {len(by_name) - named_from_mirror} searched by name."
+    )
     return seeds
 
 
@@ -458,6 +824,11 @@ def main():
         action="store_true",
         help="Use artist names already stored in the database as additional seeds.",
     )
+    parser.add_argument(
+        "--refresh-seeds",
+        action="store_true",
+        help="Fetch seed artists from the API instead of reusing payloads in the local mirror.",
+    )
     parser.add_argument("--tracks-per-artist", type=int, default=25)
     parser.add_argument("--albums-per-artist", type=int, default=15)
     parser.add_argument("--related-depth", type=int, default=3)
@@ -468,10 +839,45 @@ def main():
         help="Maximum total artists to ingest (including seeds).",
     )
     parser.add_argument(
-        "--workers", type=int, default=4, help="Number of worker threads (unused in serial mode)."
+        "--frontier",
+        choices=("fifo", "priority"),
+        default="fifo",
+        help="fifo = plain BFS; priority = expand by fans, depth and genre coverage.",
     )
     parser.add_argument(
-        "--resume-file", type=str, default="", help="Path to resume JSON (visited + queue)."
+        "--incremental",
+        action="store_true",
+        help="Fetch top tracks first and skip artists whose fingerprint is unchanged and fresh.",
+    )
+    parser.add_argument(
+        "--recrawl-ttl-days",
+        type=float,
+        default=7.0,
+        help="With --incremental, recrawl unchanged artists once their last crawl is this old.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of artists fetched concurrently (1 = serial).",
+    )
+    parser.add_argument(
+        "--resume-file",
+        type=str,
+        default="",
+        help="Path to the append-only resume log (visited + queued artists).",
+    )
+    parser.add_argument(
+        "--commit-every",
+        type=int,
+        default=10,
+        help="Number of artists written per transaction.",
+    )
+    parser.add_argument(
+        "--cache-db", default=DEFAULT_CACHE_PATH, help="Path to the Deezer response cache."
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Always hit the API; skip the response cache."
     )
     args = parser.parse_args()
 
@@ -479,11 +885,24 @@ def main():
         print(f"Database not found at {args.db}", file=sys.stderr)
         sys.exit(1)
 
+    global CLIENT
+    workers = max(1, args.workers)
+    cache = None if args.no_cache else ResponseCache(args.cache_db)
+    CLIENT = DeezerClient(
+        base_url=BASE_URL,
+        limiter=RateLimiter(),
+        cache=cache,
+        max_concurrency=workers * 3,
+    )
+
     conn = sqlite3.connect(args.db, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
     cur = conn.cursor()
 
     try:
         # build initial seeds (artist objects)
+        require_mirror_schema(cur)
         seeds = build_seed_lists(args, cur)
         if not seeds:
             print(
@@ -493,82 +912,189 @@ def main():
             sys.exit(1)
 
         # resume support
-        visited = set()
-        queue: List[dict] = []
-        if args.resume_file and os.path.exists(args.resume_file):
+        visited: set = set()
+        identity = IdentityMap(cur)
+        coverage = GenreCoverage(cur)
+        crawl_state = CrawlState(cur)
+        conn.commit()
+        ttl_seconds = args.recrawl_ttl_days * 24 * 60 * 60
+        skipped = 0
+        frontier = PriorityFrontier(coverage) if args.frontier == "priority" else Frontier()
+        checkpoint = CrawlCheckpoint(args.resume_file) if args.resume_file else None
+        resumed = None
+        if checkpoint is not None:
             try:
-                with open(args.resume_file, "r") as f:
-                    j = json.load(f)
-                    visited = set(j.get("visited", []))
-                    queue = j.get("queue", [])
+                resumed = checkpoint.load()
             except Exception as e:
                 print(f"Failed to load resume file: {e}", file=sys.stderr)
-                queue = seeds.copy()
+        if resumed is not None:
+            visited, queue = resumed
+            for artist_obj, depth, genre_hint in queue:
+                frontier.push(artist_obj, depth, genre_hint)
         else:
-            queue = seeds.copy()
-
-        # Ensure we don't re-queue visited seeds if starting fresh
-        queue = [
-            q for q in queue if str(q.get("id") or q.get("name", "")) not in visited
-        ]
+            # Ensure we don't re-queue visited seeds if starting fresh
+            for artist_obj in seeds:
+                if artist_key(artist_obj) not in visited and frontier.push(artist_obj):
+                    if checkpoint is not None:
+                        checkpoint.queued(artist_obj)
 
         total_ingested = len(visited)
         print(
-            f"Starting ingest. Queue size: {len(queue)}. Visited: {len(visited)}. Max: {args.max_artists}"
+            f"Starting ingest. Queue size: {len(frontier)}. Visited: {len(visited)}. Max: {args.max_artists}"
         )
 
-        while queue and total_ingested < args.max_artists:
-            artist_obj = queue.pop(0)
-            aid = str(artist_obj.get("id") or artist_obj.get("name", ""))
-
-            if not aid or aid in visited:
-                continue
-
-            visited.add(aid)
-            total_ingested += 1
-
-            print(
-                f"[{total_ingested}/{args.max_artists}] Ingesting: {artist_obj.get('name')}"
-            )
-
-            try:
-                ingest_artist(
-                    cur,
-                    artist_obj,
-                    tracks_per_artist=args.tracks_per_artist,
-                    albums_per_artist=args.albums_per_artist,
-                    related_depth=0,  # No recursion
-                )
-                conn.commit()
-
-                # Fetch related to expand queue
-                related = get_related_artists(
-                    str(artist_obj["id"]), limit=args.related_depth
-                )
-                for r in related:
-                    rid = str(r.get("id") or r.get("name", ""))
-                    if rid and rid not in visited:
-                        # Avoid duplicates in queue (simple check)
-                        if not any(str(q.get("id")) == rid for q in queue):
-                            queue.append(r)
-
-            except Exception as e:
-                print(
-                    f"Failed to ingest {artist_obj.get('name')}: {e}", file=sys.stderr
+        # Fetchers pull artists off the frontier and hit the API in parallel;
+        # this (main) thread is the only one that touches SQLite.
+        in_flight: Dict[str, Tuple[dict, int, Dict[str, Future]]] = {}
+        uncommitted = 0
+        with ThreadPoolExecutor(max_workers=workers * 3) as pool:
+            while True:
+                while frontier and len(in_flight) < workers and total_ingested < args.max_artists:
+                    artist_obj, depth = frontier.pop()
+                    aid = artist_key(artist_obj)
+
+                    if not aid or aid in visited:
+                        continue
+
+                    visited.add(aid)
+                    total_ingested += 1
+
+                    print(
+                        f"[{total_ingested}/{args.max_artists}] Ingesting: {artist_obj.get('name')}"
+                    )
+
+                    if not artist_obj.get("id"):
+                        print(
+                            f"Failed to ingest {artist_obj.get('name')}: missing Deezer id",
+                            file=sys.stderr,
+                        )
+                        if checkpoint is not None:
+                            checkpoint.visited(aid)
+                        continue
+
+                    # Incremental mode fetches top tracks and artist details (for
+                    # current album/fan counts) first; the rest is only
+                    # requested if the fingerprint says it changed.
+                    parts = ("artist", "top") if args.incremental else FETCH_PARTS
+                    in_flight[aid] = (
+                        artist_obj,
+                        depth,
+                        submit_artist_fetches(pool, artist_obj, args, parts),
+                    )
+
+                if not in_flight:
+                    break
+
+                wait(
+                    [f for _, _, futures in in_flight.values() for f in futures.values()],
+                    return_when=FIRST_COMPLETED,
                 )
-
-            # Save resume state every 10 artists
-            if args.resume_file and total_ingested % 10 == 0:
-                with open(args.resume_file, "w") as f:
-                    json.dump({"visited": list(visited), "queue": queue}, f)
-
-        if args.resume_file:
-            with open(args.resume_file, "w") as f:
-                json.dump({"visited": list(visited), "queue": queue}, f)
+                ready = [
+                    aid
+                    for aid, (_, _, futures) in in_flight.items()
+                    if all(f.done() for f in futures.values())
+                ]
+                for aid in ready:
+                    artist_obj, depth, futures = in_flight[aid]
+                    deezer_artist_id = str(artist_obj["id"])
+                    if "related" not in futures:
+                        error = futures["artist"].exception() or futures["top"].exception()
+                        if error is None:
+                            artist_obj = {**artist_obj, **futures["artist"].result()}
+                            fingerprint = artist_fingerprint(artist_obj, futures["top"].result())
+                            fresh = crawl_state.is_fresh(deezer_artist_id, fingerprint, ttl_seconds)
+                        else:
+                            print(
+                                f"Failed to check {artist_obj.get('name')} for changes: {error}; "
+                                "recrawling it",
+                                file=sys.stderr,
+                            )
+                            fresh = False
+                        if fresh:
+                            # Unchanged: skip albums and writes, but still follow
+                            # related artists so the crawl keeps expanding.
+                            futures.update(submit_artist_fetches(pool, artist_obj, args, ("related",)))
+                        else:
+                            # Changed: cached album lists and top tracks may
+                            # predate the change, so fetch them fresh.
+                            futures.update(
+                                submit_artist_fetches(pool, artist_obj, args, FETCH_PARTS, refresh=True)
+                            )
+                        in_flight[aid] = (artist_obj, depth, futures)
+                        continue
+
+                    in_flight.pop(aid)
+                    if "albums" not in futures:
+                        skipped += 1
+                        print(f"Unchanged, skipping: {artist_obj.get('name')}")
+                        try:
+                            for r in futures["related"].result():
+                                if artist_key(r) not in visited and frontier.push(r, depth + 1):
+                                    if checkpoint is not None:
+                                        checkpoint.queued(r, depth + 1, None)
+                        except Exception as e:
+                            print(
+                                f"Failed to expand {artist_obj.get('name')}: {e}", file=sys.stderr
+                            )
+                        if checkpoint is not None:
+                            checkpoint.visited(aid)
+                        continue
+
+                    if not conn.in_transaction:
+                        conn.execute("BEGIN")
+                    # Each artist gets a savepoint so one failure doesn't discard the batch.
+                    conn.execute("SAVEPOINT artist")
+                    genre_hint = None
+                    try:
+                        albums, top_tracks = futures["albums"].result(), futures["top"].result()
+                        batch = write_artist(cur, identity, artist_obj, albums, top_tracks)
+                        crawl_state.record(
+                            cur, deezer_artist_id, artist_fingerprint(artist_obj, top_tracks)
+                        )
+                        conn.execute("RELEASE SAVEPOINT artist")
+                        identity.absorb(batch)
+                        coverage.add(batch.new_track_genres)
+                        uncommitted += 1
+                        genre_hint = batch.dominant_genre()
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO SAVEPOINT artist")
+                        conn.execute("RELEASE SAVEPOINT artist")
+                        print(
+                            f"Failed to ingest {artist_obj.get('name')}: {e}", file=sys.stderr
+                        )
+
+                    # Related artists are followed even when the write failed.
+                    try:
+                        for r in futures["related"].result():
+                            if artist_key(r) not in visited and frontier.push(
+                                r, depth + 1, genre_hint
+                            ):
+                                if checkpoint is not None:
+                                    checkpoint.queued(r, depth + 1, genre_hint)
+                    except Exception as e:
+                        print(f"Failed to expand {artist_obj.get('name')}: {e}", file=sys.stderr)
+
+                    # Visits are only logged once the artist's rows are committed.
+                    if checkpoint is not None:
+                        checkpoint.visited(aid)
+                    if uncommitted >= args.commit_every:
+                        conn.commit()
+                        uncommitted = 0
+                        if checkpoint is not None:
+                            checkpoint.flush()
+
+        conn.commit()
+        if checkpoint is not None:
+            checkpoint.close()
 
         print("Import complete.")
+        if args.incremental:
+            print(f"Skipped {skipped} unchanged artists.")
+        if cache is not None:
+            print(cache.summary())
     finally:
         conn.close()
+        CLIENT.close()
 
 
 if __name__ == "__main__":
@@ -1,10 +1,17 @@
-import os, sys, json, time, urllib.parse, requests
+import os, sys, json, time, urllib.parse
+
+from deezer_client import DeezerClient
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
 
 BASE_URL = "https://api.deezer.com"
+CLIENT = None
 
 def api_get(path, params=None):
-    r = requests.get(f"{BASE_URL}{path}", params=params or {}, timeout=30)
-    j = r.json()
+    global CLIENT
+    if CLIENT is None:
+        CLIENT = DeezerClient(base_url=BASE_URL, limiter=RateLimiter(), cache=ResponseCache(), timeout=30)
+    j = CLIENT.get(path, params)
     if isinstance(j, dict) and "data" in j:
         return j["data"]
     return j
@@ -111,4 +118,8 @@ def main():
     print(out_path)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        if CLIENT is not None:
+            CLIENT.close()
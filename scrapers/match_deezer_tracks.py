@@ -3,24 +3,36 @@
 Match existing database tracks with Deezer API and populate deezer_track_id.
 
 This script:
-1. Reads all tracks from the database
-2. Searches Deezer API for each track by name + artist
-3. Matches and updates deezer_track_id + audio_url
+1. Reads tracks without a deezer_track_id from the database
+2. Looks each track up in the local Deezer mirror filled by ingest_deezer.py,
+   then searches Deezer API by name + artist on a miss, several at a time
+3. Matches and updates deezer_track_id + audio_url in batched commits
 4. Reports statistics
 """
 
 import sqlite3
-import requests
 import time
 import json
-from difflib import SequenceMatcher
+from concurrent.futures import ThreadPoolExecutor
+from deezer_client import DeezerAPIError, DeezerClient
+from deezer_mirror import DeezerMirror
+from fuzzy_match import best_match
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
 
 # Configuration
 DB_PATH = "../database/database.sqlite"
 BASE_URL = "https://api.deezer.com"
 BATCH_SIZE = 10  # Process in batches to avoid rate limits
-DELAY_BETWEEN_REQUESTS = 0.2  # 200ms delay between API calls
 MIN_SIMILARITY = 0.7  # 70% similarity threshold for matching
+WORKERS = 8  # concurrent searches; the shared rate limiter caps the total rate
+COMMIT_EVERY = 100  # matches per database commit
+RATE_LIMIT = None  # requests/second across all scrapers (None = limiter default)
+
+USE_CACHE = True  # serve repeated /search/track queries from disk
+USE_MIRROR = True  # resolve from crawled payloads before searching the API
+CLIENT = None
+MIRROR = None
 
 # Statistics
 stats = {
@@ -33,96 +45,124 @@ stats = {
 }
 
 
-def similarity(a, b):
-    """Calculate similarity ratio between two strings (0-1)."""
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+def get_client():
+    """Shared Deezer client (connection reuse, rate limiting, response cache)."""
+    global CLIENT
+    if CLIENT is None:
+        CLIENT = DeezerClient(
+            base_url=BASE_URL,
+            limiter=RateLimiter() if RATE_LIMIT is None else RateLimiter(rate=RATE_LIMIT),
+            cache=ResponseCache() if USE_CACHE else None,
+            timeout=10,
+            max_concurrency=WORKERS,
+        )
+    return CLIENT
+
+
+def get_mirror():
+    """Local mirror of crawled Deezer tracks, or None when disabled."""
+    global MIRROR
+    if MIRROR is None and USE_MIRROR:
+        MIRROR = DeezerMirror(DB_PATH)
+    return MIRROR
 
 
-def search_track_on_deezer(track_name, artist_name):
+def search_mirror(track_name, artist_name):
+    """Best mirror candidate as (deezer_id, audio_url, confidence_score) or None."""
+    mirror = get_mirror()
+    if mirror is None:
+        return None
+    match, score = best_match(track_name, artist_name, mirror.candidates(track_name, artist_name))
+    hit = match is not None and score >= MIN_SIMILARITY
+    mirror.record(hit)
+    return (match.get("id"), match.get("preview"), score) if hit else None
+
+
+def search_track_on_deezer(track_name, artist_name, log=print):
     """
     Search for a track on Deezer API.
 
+    log receives the per-track messages, so concurrent workers can buffer
+    them and have them printed together with the track they belong to.
+
     Returns: (deezer_id, audio_url, confidence_score) or None
     """
     try:
+        result = search_mirror(track_name, artist_name)
+        if result:
+            log(f"    [OK] Found in local mirror")
+            return result
+
         # Build search query
         query = f'{artist_name} {track_name}'
 
         # Call Deezer search API
-        response = requests.get(
-            f"{BASE_URL}/search/track",
-            params={"q": query, "limit": 5},
-            timeout=10
-        )
-
-        if not response.ok:
-            print(f"    [ERROR] API error: {response.status_code}")
+        try:
+            data = get_client().get("search/track", {"q": query, "limit": 5})
+        except DeezerAPIError as e:
+            if e.status is None:
+                raise
+            log(f"    [ERROR] API error: {e.status}")
             return None
 
-        data = response.json()
-
         if "data" not in data or len(data["data"]) == 0:
-            print(f"    [ERROR] No results found")
+            log(f"    [ERROR] No results found")
             return None
 
-        # Find best match from results
-        best_match = None
-        best_score = 0
-
-        for result in data["data"]:
-            result_title = result.get("title", "")
-            result_artist = result.get("artist", {}).get("name", "")
-
-            # Calculate similarity scores
-            title_score = similarity(track_name, result_title)
-            artist_score = similarity(artist_name, result_artist)
+        # Find best match from results (0.6 title + 0.4 artist similarity)
+        match, best_score = best_match(track_name, artist_name, data["data"])
 
-            # Combined score (weighted average)
-            combined_score = (title_score * 0.6) + (artist_score * 0.4)
-
-            if combined_score > best_score:
-                best_score = combined_score
-                best_match = result
-
-        if best_match and best_score >= MIN_SIMILARITY:
-            deezer_id = best_match.get("id")
-            preview_url = best_match.get("preview")
+        if match and best_score >= MIN_SIMILARITY:
+            deezer_id = match.get("id")
+            preview_url = match.get("preview")
 
             return (deezer_id, preview_url, best_score)
         else:
-            print(f"    [WARN] Low confidence match: {best_score:.2%}")
+            log(f"    [WARN] Low confidence match: {best_score:.2%}")
             return None
 
-    except requests.RequestException as e:
-        print(f"    [ERROR] Request error: {e}")
+    except DeezerAPIError as e:
+        log(f"    [ERROR] Request error: {e}")
         return None
     except Exception as e:
-        print(f"    [ERROR] Unexpected error: {e}")
+        log(f"    [ERROR] Unexpected error: {e}")
         return None
 
 
-def process_tracks(limit=None, dry_run=False):
+def match_track(track):
+    """Worker: search one track and return it with its result and buffered log."""
+    lines = []
+    result = search_track_on_deezer(track["track_name"], track["artist_name"], log=lines.append)
+    return track, result, lines
+
+
+def process_tracks(limit=None, dry_run=False, workers=WORKERS, commit_every=COMMIT_EVERY):
     """
-    Process all tracks and match with Deezer.
+    Process all unmatched tracks and match with Deezer.
 
     Args:
         limit: Maximum number of tracks to process (None = all)
         dry_run: If True, don't update database
+        workers: Number of concurrent searches
+        commit_every: Number of matched updates per commit
     """
     # Connect to database
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
 
-    # Get all tracks with artist info
+    cursor.execute("SELECT COUNT(*) FROM tracks WHERE deezer_track_id IS NOT NULL")
+    stats["already_set"] = cursor.fetchone()[0]
+
+    # Get unmatched tracks with artist info
     query = """
         SELECT
             t.id,
             t.name AS track_name,
-            t.deezer_track_id,
             a.name AS artist_name
         FROM tracks t
         JOIN artists a ON t.artist_id = a.id
+        WHERE t.deezer_track_id IS NULL
     """
 
     if limit:
@@ -131,61 +171,73 @@ def process_tracks(limit=None, dry_run=False):
     cursor.execute(query)
     tracks = cursor.fetchall()
 
-    stats["total"] = len(tracks)
+    stats["total"] = len(tracks) + stats["already_set"]
 
     print(f"\n{'='*60}")
-    print(f"Processing {stats['total']} tracks...")
+    print(f"Processing {len(tracks)} unmatched tracks ({stats['already_set']} already have an ID)...")
     print(f"Dry run: {dry_run}")
+    print(f"Workers: {workers}, commit every {commit_every} matches")
     print(f"{'='*60}\n")
 
-    for i, track in enumerate(tracks, 1):
-        track_id = track["id"]
-        track_name = track["track_name"]
-        artist_name = track["artist_name"]
-        existing_deezer_id = track["deezer_track_id"]
-
-        print(f"[{i}/{stats['total']}] {track_name} by {artist_name}")
-
-        # Skip if already has deezer_track_id
-        if existing_deezer_id:
-            print(f"    [OK] Already has Deezer ID: {existing_deezer_id}")
-            stats["already_set"] += 1
-            continue
-
-        # Search on Deezer
-        result = search_track_on_deezer(track_name, artist_name)
-
-        if result:
-            deezer_id, preview_url, confidence = result
-
-            print(f"    [OK] Matched! Deezer ID: {deezer_id} (confidence: {confidence:.2%})")
-
-            if not dry_run:
-                # Update database
-                try:
-                    cursor.execute(
-                        "UPDATE tracks SET deezer_track_id = ?, audio_url = ? WHERE id = ?",
-                        (str(deezer_id), preview_url, track_id)
-                    )
-                    conn.commit()
-                    print(f"    [OK] Database updated")
-                    stats["matched"] += 1
-                except Exception as e:
-                    print(f"    [ERROR] Database update failed: {e}")
-                    stats["errors"] += 1
-            else:
-                stats["matched"] += 1
-        else:
-            stats["not_found"] += 1
-
-        # Rate limiting
-        time.sleep(DELAY_BETWEEN_REQUESTS)
-
-        # Print progress every 50 tracks
-        if i % 50 == 0:
-            print(f"\n--- Progress: {i}/{stats['total']} ---")
-            print(f"Matched: {stats['matched']}, Not found: {stats['not_found']}, Errors: {stats['errors']}\n")
-
+    # Create the shared client and mirror before the workers race to do it.
+    get_client()
+    get_mirror()
+
+    pending = []
+
+    def flush():
+        # Write the buffered matches in one transaction.
+        if not pending:
+            return
+        try:
+            cursor.executemany(
+                "UPDATE tracks SET deezer_track_id = ?, audio_url = ? WHERE id = ?",
+                pending
+            )
+            conn.commit()
+            print(f"    [OK] Database updated ({len(pending)} tracks)")
+            stats["matched"] += len(pending)
+        except Exception as e:
+            conn.rollback()
+            print(f"    [ERROR] Database update failed: {e}")
+            stats["errors"] += len(pending)
+        pending.clear()
+
+    # Searches run in the pool; this thread prints results in input order and
+    # owns the only database connection.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        try:
+            for i, (track, result, lines) in enumerate(pool.map(match_track, tracks), 1):
+                print(f"[{i}/{len(tracks)}] {track['track_name']} by {track['artist_name']}")
+                for line in lines:
+                    print(line)
+
+                if result:
+                    deezer_id, preview_url, confidence = result
+
+                    print(f"    [OK] Matched! Deezer ID: {deezer_id} (confidence: {confidence:.2%})")
+
+                    if not dry_run:
+                        pending.append((str(deezer_id), preview_url, track["id"]))
+                        if len(pending) >= commit_every:
+                            flush()
+                    else:
+                        stats["matched"] += 1
+                else:
+                    stats["not_found"] += 1
+
+                # Print progress every 50 tracks
+                if i % 50 == 0:
+                    print(f"\n--- Progress: {i}/{len(tracks)} ---")
+                    print(f"Matched: {stats['matched'] + len(pending)}, Not found: {stats['not_found']}, Errors: {stats['errors']}\n")
+        except KeyboardInterrupt:
+            # Keep whatever was matched so far, then let the caller report it.
+            pool.shutdown(wait=False, cancel_futures=True)
+            flush()
+            conn.close()
+            raise
+
+    flush()
     conn.close()
 
     # Final report
@@ -198,6 +250,10 @@ def process_tracks(limit=None, dry_run=False):
     print(f"Not found:           {stats['not_found']}")
     print(f"Errors:              {stats['errors']}")
     print(f"Success rate:        {(stats['matched'] / (stats['total'] - stats['already_set']) * 100) if stats['total'] > stats['already_set'] else 0:.1f}%")
+    if MIRROR is not None:
+        print(MIRROR.summary())
+    if CLIENT is not None and CLIENT.cache is not None:
+        print(CLIENT.cache.summary())
     print(f"{'='*60}\n")
 
     # Save report to file
@@ -217,6 +273,17 @@ if __name__ == "__main__":
     for arg in sys.argv[1:]:
         if arg.startswith("--limit="):
             limit = int(arg.split("=")[1])
+        elif arg.startswith("--workers="):
+            WORKERS = int(arg.split("=")[1])
+        elif arg.startswith("--commit-every="):
+            COMMIT_EVERY = int(arg.split("=")[1])
+        elif arg.startswith("--rate="):
+            RATE_LIMIT = float(arg.split("=")[1])
+
+    if "--no-cache" in sys.argv:
+        USE_CACHE = False
+    if "--no-mirror" in sys.argv:
+        USE_MIRROR = False
 
     print("\nDeezer Track Matching Script")
     print("=" * 60)
@@ -230,7 +297,7 @@ if __name__ == "__main__":
     print()
 
     try:
-        process_tracks(limit=limit, dry_run=dry_run)
+        process_tracks(limit=limit, dry_run=dry_run, workers=WORKERS, commit_every=COMMIT_EVERY)
     except KeyboardInterrupt:
         print("\n\nWARNING: Interrupted by user")
         print(f"\nProgress so far:")
@@ -239,3 +306,9 @@ if __name__ == "__main__":
         print(f"\n\nERROR: Fatal error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        # Closing writes the cache's buffered access times and stops the client's loop thread.
+        if CLIENT is not None:
+            CLIENT.close()
+        if MIRROR is not None:
+            MIRROR.close()
@@ -1,77 +1,32 @@
 """
 Normalize track genres using album genre, artist dominance, and slug/id mapping.
 Safe to rerun; will only update category_slug/deezer_genre_id when a better slug is available.
+
+The default sql engine computes album and dominant artist genres with
+aggregate/window queries into temp tables and applies every change with one
+UPDATE ... FROM in a single transaction; --engine python keeps the original
+row-by-row loop.
 """
 
 import argparse
 import os
 import sqlite3
-from collections import Counter, defaultdict
-from typing import Optional
-
-GENERIC = {"unknown", "misc", "other", "", "music", "various", "various-artists"}
-
-GENRE_ID_TO_SLUG = {
-    "132": "pop",
-    "116": "hip-hop",
-    "152": "metal",
-    "85": "rock",
-    "98": "folk-and-acoustic",
-    "173": "classical",
-    "169": "jazz",
-    "113": "dance-electronic",
-    "165": "soul",
-    "4642": "latin",
-    "75": "reggae",
-    "1324": "country",
-    "84": "punk",
-}
-
-SLUG_TO_ID = {v: k for k, v in GENRE_ID_TO_SLUG.items()}
-
-
-def normalize_slug(value: Optional[str]) -> Optional[str]:
-    if not value:
-        return None
-    s = str(value).strip().lower()
-    if s in GENERIC:
-        return None
-    return s
-
-
-def slug_from_id(genre_id: Optional[str]) -> Optional[str]:
-    if not genre_id:
-        return None
-    return GENRE_ID_TO_SLUG.get(str(genre_id).strip())
-
-
-def dominant_slug(slugs: list[str]) -> Optional[str]:
-    counts = Counter([s for s in slugs if s])
-    if not counts:
-        return None
-    slug, count = counts.most_common(1)[0]
-    if count == 0:
-        return None
-    return slug
+import time
+from collections import defaultdict
 
+from genre_resolution import SLUG_TO_ID, dominant_slug, normalize_slug, slug_from_id
 
-def main():
-    parser = argparse.ArgumentParser(description="Normalize category_slug/deezer_genre_id using album + artist info.")
-    parser.add_argument("--db", default=os.path.join(os.path.dirname(__file__), "..", "database", "database.sqlite"))
-    args = parser.parse_args()
-
-    conn = sqlite3.connect(args.db)
-    cur = conn.cursor()
 
+def normalize_python(cur) -> int:
     # Fetch album genres
     cur.execute("SELECT id, genre FROM albums")
-    album_genres = {row[0]: normalize_slug(row[1]) for row in cur.fetchall()}
+    album_genres = {str(row[0]): normalize_slug(row[1]) for row in cur.fetchall()}
 
     # Fetch artist dominant slug based on album genres
     artist_albums: dict[str, list[str]] = defaultdict(list)
     cur.execute("SELECT artist_id, genre FROM albums WHERE genre IS NOT NULL")
     for artist_id, gen in cur.fetchall():
-        artist_albums[artist_id].append(normalize_slug(gen))
+        artist_albums[str(artist_id)].append(normalize_slug(gen))
     artist_dominant = {aid: dominant_slug(slugs) for aid, slugs in artist_albums.items()}
 
     # Fetch all tracks
@@ -89,8 +44,9 @@ def main():
         if current_slug:
             continue  # already good enough
 
-        album_slug = normalize_slug(album_genres.get(album_id))
-        artist_slug = normalize_slug(artist_dominant.get(artist_id))
+        # tracks.album_id/artist_id have integer affinity; albums key by text.
+        album_slug = normalize_slug(album_genres.get(str(album_id)))
+        artist_slug = normalize_slug(artist_dominant.get(str(artist_id)))
 
         chosen = album_slug or artist_slug
         if not chosen:
@@ -106,6 +62,122 @@ def main():
             (chosen, chosen_id, track_id),
         )
         updated += cur.rowcount
+    return updated
+
+
+def register_functions(conn):
+    """Expose the Python slug rules to SQL so both engines normalise identically."""
+    conn.create_function("normalize_slug", 1, normalize_slug, deterministic=True)
+    conn.create_function("slug_from_id", 1, slug_from_id, deterministic=True)
+
+
+def normalize_sql(conn, cur, batch_size: int = 10000) -> int:
+    register_functions(conn)
+    started = time.time()
+
+    def progress(message: str):
+        print(f"[{time.time() - started:6.1f}s] {message}")
+
+    cur.execute("CREATE TEMP TABLE genre_map (slug TEXT PRIMARY KEY, genre_id TEXT NOT NULL)")
+    cur.executemany("INSERT INTO genre_map VALUES (?, ?)", SLUG_TO_ID.items())
+
+    cur.execute(
+        """
+        CREATE TEMP TABLE album_slugs AS
+        SELECT CAST(id AS TEXT) AS album_id, normalize_slug(genre) AS slug
+        FROM albums
+        WHERE normalize_slug(genre) IS NOT NULL
+        """
+    )
+    cur.execute("CREATE UNIQUE INDEX temp.album_slugs_id ON album_slugs (album_id)")
+    progress(f"{cur.execute('SELECT COUNT(*) FROM album_slugs').fetchone()[0]} albums with a genre")
+
+    # Most common album genre per artist; ties go to the genre seen first,
+    # like Counter.most_common() over albums in table order.
+    cur.execute(
+        """
+        CREATE TEMP TABLE artist_slugs AS
+        WITH counted AS (
+            SELECT CAST(artist_id AS TEXT) AS artist_id, normalize_slug(genre) AS slug,
+                   COUNT(*) AS albums, MIN(rowid) AS first_seen
+            FROM albums
+            WHERE genre IS NOT NULL
+            GROUP BY 1, 2
+            HAVING slug IS NOT NULL
+        ), ranked AS (
+            SELECT artist_id, slug,
+                   ROW_NUMBER() OVER (PARTITION BY artist_id ORDER BY albums DESC, first_seen) AS pick
+            FROM counted
+        )
+        SELECT artist_id, slug FROM ranked WHERE pick = 1
+        """
+    )
+    cur.execute("CREATE UNIQUE INDEX temp.artist_slugs_id ON artist_slugs (artist_id)")
+    progress(f"{cur.execute('SELECT COUNT(*) FROM artist_slugs').fetchone()[0]} artists with a dominant genre")
+
+    # As in the python engine, an unmappable album genre does not fall back to the artist.
+    cur.execute(
+        """
+        CREATE TEMP TABLE genre_changes AS
+        SELECT t.id AS track_id, g.slug, g.genre_id
+        FROM tracks t
+        LEFT JOIN album_slugs al ON al.album_id = CAST(t.album_id AS TEXT)
+        LEFT JOIN artist_slugs ar ON ar.artist_id = CAST(t.artist_id AS TEXT)
+        JOIN genre_map g ON g.slug = COALESCE(al.slug, ar.slug)
+        WHERE normalize_slug(t.category_slug) IS NULL
+          AND slug_from_id(t.deezer_genre_id) IS NULL
+          AND (t.category_slug IS NOT g.slug OR t.deezer_genre_id IS NOT g.genre_id)
+        """
+    )
+    changes = cur.execute("SELECT COUNT(*) FROM genre_changes").fetchone()[0]
+    progress(f"{changes} tracks to update")
+
+    if sqlite3.sqlite_version_info >= (3, 33, 0):
+        cur.execute(
+            """
+            UPDATE tracks SET category_slug = c.slug, deezer_genre_id = c.genre_id
+            FROM genre_changes c
+            WHERE tracks.id = c.track_id
+            """
+        )
+        updated = cur.rowcount
+    else:
+        # UPDATE ... FROM needs SQLite 3.33+.
+        cur.execute("SELECT slug, genre_id, track_id FROM genre_changes")
+        updated = 0
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                break
+            conn.executemany("UPDATE tracks SET category_slug=?, deezer_genre_id=? WHERE id=?", batch)
+            updated += len(batch)
+            progress(f"{updated}/{changes} tracks updated")
+    progress(f"applied {updated} updates")
+
+    for table in ("genre_changes", "artist_slugs", "album_slugs", "genre_map"):
+        cur.execute(f"DROP TABLE temp.{table}")
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalize category_slug/deezer_genre_id using album + artist info.")
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(__file__), "..", "database", "database.sqlite"))
+    parser.add_argument(
+        "--engine",
+        choices=["sql", "python"],
+        default="sql",
+        help="sql: set-based temp tables and one UPDATE; python: row-by-row loop.",
+    )
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    cur = conn.cursor()
+
+    # One transaction either way: all changes land together or not at all.
+    if args.engine == "sql":
+        updated = normalize_sql(conn, cur)
+    else:
+        updated = normalize_python(cur)
 
     conn.commit()
     print(f"Updated {updated} tracks with normalized genres.")
@@ -0,0 +1,116 @@
+"""
+Host-wide token bucket for Deezer API calls.
+
+Bucket state lives in a small SQLite file, so every scraper process on the
+machine draws from the same budget. Callers reserve a token and sleep for the
+returned delay, which lets concurrent clients queue up behind each other and
+run at exactly the configured rate instead of sleeping a fixed interval.
+
+Deezer allows 50 requests per 5 seconds. A 5-token burst plus 9 tokens/s
+refill keeps any 5-second window at or under that. When Deezer still throttles
+us (HTTP 429 or an {"error": {"code": 4}} payload), penalize() halves the rate
+and drains the bucket. The rate then climbs back linearly to the configured
+ceiling.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Optional
+
+DEFAULT_PATH = os.environ.get(
+    "DEEZER_RATE_LIMIT_DB",
+    os.path.join(tempfile.gettempdir(), "deezer_rate_limit.sqlite"),
+)
+DEFAULT_RATE = 9.0
+DEFAULT_BURST = 5.0
+MIN_RATE = 1.0
+RECOVERY_PER_SECOND = 0.1  # tokens/s regained per second after a penalty
+PENALTY_COOLDOWN = 1.0
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        name: str = "deezer",
+        rate: float = DEFAULT_RATE,
+        burst: float = DEFAULT_BURST,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                rate REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+
+    def _update(self, apply) -> float:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT tokens, rate, updated FROM buckets WHERE name=?", (self.name,)
+                ).fetchone()
+                if row is None:
+                    tokens, rate = self.burst, self.rate
+                else:
+                    tokens, rate, updated = row
+                    elapsed = max(0.0, now - updated)
+                    rate = min(self.rate, rate + RECOVERY_PER_SECOND * elapsed)
+                    tokens = min(self.burst, tokens + elapsed * rate)
+                tokens, rate, wait = apply(tokens, rate)
+                self._conn.execute(
+                    """
+                    INSERT INTO buckets (name, tokens, rate, updated) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET
+                        tokens=excluded.tokens, rate=excluded.rate, updated=excluded.updated
+                    """,
+                    (self.name, tokens, rate, now),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it."""
+
+        def apply(tokens: float, rate: float):
+            tokens -= 1.0
+            wait = -tokens / rate if tokens < 0 else 0.0
+            return tokens, rate, wait
+
+        return self._update(apply)
+
+    def acquire(self):
+        time.sleep(self.reserve())
+
+    def penalize(self, retry_after: Optional[float] = None):
+        """Back off after Deezer reported we exceeded the quota."""
+
+        def apply(tokens: float, rate: float):
+            rate = max(MIN_RATE, rate / 2)
+            cooldown = retry_after if retry_after is not None else PENALTY_COOLDOWN
+            return min(tokens, -cooldown * rate), rate, 0.0
+
+        self._update(apply)
+
+    def close(self):
+        self._conn.close()
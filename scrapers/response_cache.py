@@ -0,0 +1,190 @@
+"""
+On-disk cache for Deezer API responses.
+
+Entries are keyed on a hash of the request path and its sorted params and are
+stored zlib-compressed in a SQLite file. Each endpoint family has its own TTL:
+searches and top tracks go stale after a day, while album lists and related
+artists are kept for a week. When the file grows past max_bytes, the least
+recently used entries are evicted. Several scraper processes share the file,
+so the running size kept per process is re-read from the table periodically
+and before every eviction. Access times for hits are buffered and
+written in batches rather than committed on every read.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+DAY = 24 * 60 * 60
+DEFAULT_PATH = os.environ.get(
+    "DEEZER_CACHE_DB",
+    os.path.join(os.path.dirname(__file__), "..", "database", "deezer_cache.sqlite"),
+)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL = DAY
+TOUCH_BATCH = 256
+SIZE_SYNC_PUTS = 256
+
+# First match wins; paths are normalized with numeric ids replaced by {id}.
+ENDPOINT_TTLS = [
+    ("search/", DAY),
+    ("artist/{id}/albums", 7 * DAY),
+    ("artist/{id}/related", 7 * DAY),
+    ("artist/{id}/top", DAY),
+    ("artist/{id}", DAY),
+    ("album/{id}", 30 * DAY),
+    ("track/{id}", 30 * DAY),
+]
+
+ID_RE = re.compile(r"(?<=/)\d+(?=/|$)")
+
+
+def endpoint_of(path: str) -> str:
+    return ID_RE.sub("{id}", path.strip("/"))
+
+
+def cache_key(path: str, params: Optional[Dict]) -> str:
+    normalized = {str(k): str(v) for k, v in (params or {}).items()}
+    raw = path.strip("/") + "?" + json.dumps(normalized, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def ttl_for(endpoint: str) -> int:
+    for prefix, ttl in ENDPOINT_TTLS:
+        if endpoint.startswith(prefix):
+            return ttl
+    return DEFAULT_TTL
+
+
+class ResponseCache:
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses(accessed_at)"
+        )
+        self._conn.commit()
+        self._puts_since_sync = 0
+        self._sync_size()
+
+    def get(self, path: str, params: Optional[Dict] = None) -> Optional[Any]:
+        key = cache_key(path, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT endpoint, body, fetched_at FROM responses WHERE key=?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            endpoint, body, fetched_at = row
+            if now - fetched_at > ttl_for(endpoint):
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= TOUCH_BATCH:
+                self._write_touches()
+                self._conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(body))
+
+    def put(self, path: str, params: Optional[Dict], payload: Any):
+        key = cache_key(path, params)
+        body = zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key=?", (key,)).fetchone()
+            self._conn.execute(
+                """
+                INSERT INTO responses (key, endpoint, body, size, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    body=excluded.body, size=excluded.size,
+                    fetched_at=excluded.fetched_at, accessed_at=excluded.accessed_at
+                """,
+                (key, endpoint_of(path), body, len(body), now, now),
+            )
+            self._size += len(body) - (old[0] if old else 0)
+            self._puts_since_sync += 1
+            if self._puts_since_sync >= SIZE_SYNC_PUTS:
+                self._sync_size()
+            self._touched.pop(key, None)
+            self._write_touches()
+            if self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _write_touches(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET accessed_at=? WHERE key=?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def flush(self):
+        """Write buffered access times."""
+        with self._lock:
+            self._write_touches()
+            self._conn.commit()
+
+    def _sync_size(self):
+        # Other processes write to the same file; the table is the source of truth.
+        self._size = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        self._puts_since_sync = 0
+
+    def _evict(self):
+        # Drop least recently used entries until we are back under 90% of the budget.
+        self._sync_size()
+        if self._size <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        cur = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at")
+        doomed = []
+        for key, size in cur:
+            if self._size <= target:
+                break
+            doomed.append((key,))
+            self._size -= size
+        self._conn.executemany("DELETE FROM responses WHERE key=?", doomed)
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return (
+            f"Response cache: {self.hits} hits, {self.misses} misses "
+            f"({self.expired} expired), hit rate {rate:.1f}%"
+        )
+
+    def close(self):
+        self.flush()
+        self._conn.close()
@@ -6,35 +6,78 @@ This script:
 1. Targets only tracks without deezer_track_id
 2. Uses lower similarity threshold (60%)
 3. Cleans track names (removes feat., Acoustic, etc.)
-4. Tries multiple search variations
+4. Tries multiple search variations, skipping duplicate queries and stopping
+   early once a result is confident enough
+5. Checks the local Deezer mirror filled by ingest_deezer.py before any
+   search is sent
+6. Learns which variation tends to win for each kind of title (feat., remix,
+   live, ...) and tries that one first on later runs
 """
 
 import sqlite3
-import requests
-import time
 import json
 import re
-from difflib import SequenceMatcher
+from functools import lru_cache
+
+from app_schema import require_tables
+from deezer_client import DeezerAPIError, DeezerClient
+from deezer_mirror import DeezerMirror
+from fuzzy_match import best_match
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
 
 # Configuration
 DB_PATH = "../database/database.sqlite"
 BASE_URL = "https://api.deezer.com"
-DELAY_BETWEEN_REQUESTS = 0.2
 MIN_SIMILARITY = 0.60  # Lowered from 0.70
+STOP_CONFIDENCE = 0.90  # stop trying variations once a match scores this high
+
+USE_CACHE = True  # serve repeated /search/track queries from disk
+USE_MIRROR = True  # resolve from crawled payloads before searching the API
+CLIENT = None
+MIRROR = None
 
 # Statistics
 stats = {
     "total": 0,
     "matched": 0,
     "not_found": 0,
+    "queries": 0,
 }
 
+# Default variation order; learned win rates reorder it per title kind.
+VARIATIONS = ["original", "cleaned", "title_only", "cleaned_title_only"]
+
+TITLE_KINDS = [
+    ("feat", re.compile(r'\b(feat\.?|ft\.|featuring)\s', re.IGNORECASE)),
+    ("remix", re.compile(r'\b(remix|mix|rework|bootleg)\b', re.IGNORECASE)),
+    ("live", re.compile(r'\blive\b', re.IGNORECASE)),
+    ("version", re.compile(r'\b(acoustic|radio edit|album version|single version|explicit|clean|remaster(ed)?)\b', re.IGNORECASE)),
+]
+
+
+def get_client():
+    """Shared Deezer client (connection reuse, rate limiting, response cache)."""
+    global CLIENT
+    if CLIENT is None:
+        CLIENT = DeezerClient(
+            base_url=BASE_URL,
+            limiter=RateLimiter(),
+            cache=ResponseCache() if USE_CACHE else None,
+            timeout=10,
+        )
+    return CLIENT
 
-def similarity(a, b):
-    """Calculate similarity ratio between two strings (0-1)."""
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
 
+def get_mirror():
+    """Local mirror of crawled Deezer tracks, or None when disabled."""
+    global MIRROR
+    if MIRROR is None and USE_MIRROR:
+        MIRROR = DeezerMirror(DB_PATH)
+    return MIRROR
 
+
+@lru_cache(maxsize=65536)
 def clean_track_name(name):
     """
     Remove common noise from track names to improve matching.
@@ -54,72 +97,150 @@ def clean_track_name(name):
     return name
 
 
-def search_track_variations(track_name, artist_name):
-    """
-    Try multiple search variations to find best match.
+def title_kind(name):
+    """Classify a title by the noise it carries: feat, remix, live, version or plain."""
+    for kind, pattern in TITLE_KINDS:
+        if pattern.search(name):
+            return kind
+    return "plain"
 
-    Returns: (deezer_id, audio_url, confidence_score) or None
+
+class VariationStrategy:
+    """
+    Per title kind win counts for each search variation, persisted in the
+    retry_variation_stats table so later runs try the usual winner first.
     """
-    variations = [
+
+    def __init__(self, conn):
+        self.conn = conn
+        require_tables(conn, "retry_variation_stats")
+        self.counts = {}
+        for kind, variation, attempts, wins in conn.execute(
+            "SELECT title_kind, variation, attempts, wins FROM retry_variation_stats"
+        ):
+            self.counts[(kind, variation)] = [attempts, wins]
+
+    def order(self, kind):
+        """Variations sorted by smoothed win rate; the default order breaks ties."""
+        def win_rate(variation):
+            attempts, wins = self.counts.get((kind, variation), (0, 0))
+            return (wins + 1) / (attempts + 2)
+
+        return sorted(VARIATIONS, key=lambda v: (-win_rate(v), VARIATIONS.index(v)))
+
+    def record(self, kind, tried, winner):
+        rows = []
+        for variation in tried:
+            counts = self.counts.setdefault((kind, variation), [0, 0])
+            counts[0] += 1
+            counts[1] += variation == winner
+            rows.append((kind, variation, counts[0], counts[1]))
+        # Committed together with the next track update.
+        self.conn.executemany(
+            """
+            INSERT INTO retry_variation_stats (title_kind, variation, attempts, wins)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(title_kind, variation) DO UPDATE SET
+                attempts=excluded.attempts, wins=excluded.wins
+            """,
+            rows
+        )
+
+
+def build_variations(track_name, artist_name):
+    """Search variation name -> (query, expected_track, expected_artist)."""
+    cleaned = clean_track_name(track_name)
+    return {
         # 1. Original search
-        (f'{artist_name} {track_name}', track_name, artist_name),
+        "original": (f'{artist_name} {track_name}', track_name, artist_name),
 
         # 2. Cleaned track name
-        (f'{artist_name} {clean_track_name(track_name)}', clean_track_name(track_name), artist_name),
+        "cleaned": (f'{artist_name} {cleaned}', cleaned, artist_name),
 
         # 3. Just track name (in case artist is wrong)
-        (track_name, track_name, None),
+        "title_only": (track_name, track_name, None),
 
         # 4. Cleaned track name only
-        (clean_track_name(track_name), clean_track_name(track_name), None),
-    ]
+        "cleaned_title_only": (cleaned, cleaned, None),
+    }
+
+
+def search_track_variations(track_name, artist_name, strategy=None, exhaustive=False):
+    """
+    Try multiple search variations to find best match.
+
+    Variations are tried in the order the strategy has learned for this kind
+    of title. Queries identical to one already sent are skipped, and the
+    search stops at the first match scoring STOP_CONFIDENCE or more unless
+    exhaustive is set.
+
+    Returns: (deezer_id, audio_url, confidence_score) or None
+    """
+    mirror = get_mirror()
+    if mirror is not None:
+        # Crawled artists usually have the track in the mirror already.
+        cleaned = clean_track_name(track_name)
+        candidates = mirror.candidates(cleaned or track_name, artist_name)
+        match, score = max(
+            (best_match(expected, artist_name, candidates) for expected in {track_name, cleaned}),
+            key=lambda found: found[1],
+        )
+        mirror.record(score >= MIN_SIMILARITY)
+        if match is not None and score >= MIN_SIMILARITY:
+            print(f"    [OK] Found in local mirror: {match.get('title')} by {match.get('artist', {}).get('name')} ({score:.2%})")
+            return (match.get("id"), match.get("preview"), score)
+
+    kind = title_kind(track_name)
+    variations = build_variations(track_name, artist_name)
+    order = strategy.order(kind) if strategy is not None else VARIATIONS
 
     best_overall_match = None
     best_overall_score = 0
+    best_variation = None
+    tried = []
+    seen_queries = set()
 
-    for query, expected_track, expected_artist in variations:
-        try:
-            response = requests.get(
-                f"{BASE_URL}/search/track",
-                params={"q": query, "limit": 10},  # Increased limit
-                timeout=10
-            )
+    for variation in order:
+        query, expected_track, expected_artist = variations[variation]
+        if query in seen_queries:
+            continue
+        seen_queries.add(query)
+        if best_overall_score >= STOP_CONFIDENCE and not exhaustive:
+            break
+        tried.append(variation)
+        stats["queries"] += 1
 
-            if not response.ok:
+        try:
+            try:
+                data = get_client().get(
+                    "search/track",
+                    {"q": query, "limit": 10},  # Increased limit
+                )
+            except DeezerAPIError as e:
+                if e.status is None:
+                    raise
                 continue
 
-            data = response.json()
-
             if "data" not in data or len(data["data"]) == 0:
                 continue
 
-            # Find best match from results
-            for result in data["data"]:
-                result_title = result.get("title", "")
-                result_artist = result.get("artist", {}).get("name", "")
-
-                # Calculate similarity scores
-                title_score = similarity(expected_track, result_title)
-
-                # If we're checking artist, include it
-                if expected_artist:
-                    artist_score = similarity(expected_artist, result_artist)
-                    combined_score = (title_score * 0.6) + (artist_score * 0.4)
-                else:
-                    # Just use title score if we're ignoring artist
-                    combined_score = title_score
-
-                if combined_score > best_overall_score:
-                    best_overall_score = combined_score
-                    best_overall_match = result
-
-            time.sleep(DELAY_BETWEEN_REQUESTS)
+            # Find best match from results; without an expected artist
+            # only the title score counts
+            match, score = best_match(expected_track, expected_artist, data["data"])
+            if score > best_overall_score:
+                best_overall_score = score
+                best_overall_match = match
+                best_variation = variation
 
         except Exception as e:
             print(f"    [WARN] Search variation failed: {e}")
             continue
 
-    if best_overall_match and best_overall_score >= MIN_SIMILARITY:
+    matched = best_overall_match is not None and best_overall_score >= MIN_SIMILARITY
+    if strategy is not None and tried:
+        strategy.record(kind, tried, best_variation if matched else None)
+
+    if matched:
         deezer_id = best_overall_match.get("id")
         preview_url = best_overall_match.get("preview")
 
@@ -131,7 +252,7 @@ def search_track_variations(track_name, artist_name):
         return None
 
 
-def retry_unmatched_tracks():
+def retry_unmatched_tracks(exhaustive=False):
     """
     Retry matching tracks that don't have deezer_track_id.
     """
@@ -139,6 +260,7 @@ def retry_unmatched_tracks():
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
+    strategy = VariationStrategy(conn)
 
     # Get tracks without deezer_track_id
     query = """
@@ -169,7 +291,7 @@ def retry_unmatched_tracks():
         print(f"[{i}/{stats['total']}] {track_name} by {artist_name}")
 
         # Try multiple search variations
-        result = search_track_variations(track_name, artist_name)
+        result = search_track_variations(track_name, artist_name, strategy, exhaustive)
 
         if result:
             deezer_id, preview_url, confidence = result
@@ -187,9 +309,11 @@ def retry_unmatched_tracks():
         else:
             print(f"    [ERROR] No suitable match found")
             stats["not_found"] += 1
+            conn.commit()
 
         print()  # Blank line for readability
 
+    conn.commit()
     conn.close()
 
     # Final report
@@ -200,10 +324,23 @@ def retry_unmatched_tracks():
     print(f"Newly matched:       {stats['matched']}")
     print(f"Still unmatched:     {stats['not_found']}")
     print(f"Success rate:        {(stats['matched'] / stats['total'] * 100) if stats['total'] > 0 else 0:.1f}%")
+    print(f"Search queries:      {stats['queries']} (of {stats['total'] * len(VARIATIONS)} without early exit)")
+    if MIRROR is not None:
+        print(MIRROR.summary())
+    if CLIENT is not None and CLIENT.cache is not None:
+        print(CLIENT.cache.summary())
     print(f"{'='*60}\n")
 
 
 if __name__ == "__main__":
+    import sys
+
+    if "--no-cache" in sys.argv:
+        USE_CACHE = False
+    if "--no-mirror" in sys.argv:
+        USE_MIRROR = False
+    exhaustive = "--all-variations" in sys.argv
+
     print("\nDeezer Track Retry Matching Script")
     print("=" * 60)
     print("Lower threshold: 60%")
@@ -211,7 +348,7 @@ if __name__ == "__main__":
     print()
 
     try:
-        retry_unmatched_tracks()
+        retry_unmatched_tracks(exhaustive=exhaustive)
     except KeyboardInterrupt:
         print("\n\nWARNING: Interrupted by user")
         print(f"\nProgress so far:")
@@ -220,3 +357,9 @@ if __name__ == "__main__":
         print(f"\n\nERROR: Fatal error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        # Closing writes the cache's buffered access times and stops the client's loop thread.
+        if CLIENT is not None:
+            CLIENT.close()
+        if MIRROR is not None:
+            MIRROR.close()
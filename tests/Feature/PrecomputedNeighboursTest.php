@@ -0,0 +1,151 @@
+<?php
+
+use App\Models\Album;
+use App\Models\Artist;
+use App\Models\Category;
+use App\Models\SeedEmbedding;
+use App\Models\Track;
+use App\Models\TrackEmbedding;
+use App\Models\TrackNeighbor;
+use App\Services\Recommendation\MetadataScorer;
+use App\Services\Recommendation\RecommendationContext;
+use App\Services\Recommendation\RecommendationService;
+use App\Services\Recommendation\SeedProfile;
+use Illuminate\Foundation\Testing\RefreshDatabase;
+
+uses(RefreshDatabase::class);
+
+function neighbourTestService(): RecommendationService
+{
+    $scorer = new class extends MetadataScorer
+    {
+        public function __construct() {}
+
+        public function score(Track $candidate, SeedProfile $seed, string $seedType = 'track', ?string $seedGenreKey = null): float
+        {
+            return 0.0;
+        }
+    };
+
+    return new RecommendationService(metadataScorer: $scorer);
+}
+
+function neighbourTestTrack(string $id, Artist $artist, Album $album): Track
+{
+    return Track::create([
+        'id' => $id,
+        'name' => ucfirst($id),
+        'artist_id' => $artist->id,
+        'album_id' => $album->id,
+        'duration' => 200,
+        'audio_url' => "https://example.test/{$id}.mp3",
+        'category_slug' => 'test',
+        'radio_genre_key' => 'metal',
+        'deezer_genre_id' => '152',
+    ]);
+}
+
+beforeEach(function () {
+    Category::create([
+        'slug' => 'test',
+        'name' => 'Test',
+        'color' => '#000000',
+        'image_url' => 'https://example.test/category.png',
+    ]);
+
+    $this->artist = Artist::create([
+        'id' => '1',
+        'name' => 'Seed Artist',
+        'image_url' => 'https://example.test/artist.png',
+        'monthly_listeners' => 1,
+        'is_verified' => false,
+    ]);
+
+    $this->album = Album::create([
+        'id' => '10',
+        'name' => 'Seed Album',
+        'artist_id' => $this->artist->id,
+        'image_url' => 'https://example.test/album.png',
+        'release_date' => '2000-01-01',
+        'genre' => 'Unknown',
+    ]);
+
+    $this->otherAlbum = Album::create([
+        'id' => '11',
+        'name' => 'Other Album',
+        'artist_id' => $this->artist->id,
+        'image_url' => 'https://example.test/album2.png',
+        'release_date' => '2000-01-01',
+        'genre' => 'Unknown',
+    ]);
+});
+
+it('prefers the precomputed album seed vector', function () {
+    $seed = neighbourTestTrack('seed-1', $this->artist, $this->album);
+    $candidateA = neighbourTestTrack('cand-a', $this->artist, $this->otherAlbum);
+    $candidateB = neighbourTestTrack('cand-b', $this->artist, $this->otherAlbum);
+
+    TrackEmbedding::create(['track_id' => $seed->id, 'embedding' => [1.0, 0.0]]);
+    TrackEmbedding::create(['track_id' => $candidateA->id, 'embedding' => [1.0, 0.0]]);
+    TrackEmbedding::create(['track_id' => $candidateB->id, 'embedding' => [0.0, 1.0]]);
+
+    // The stored vector wins over averaging the album's track embeddings.
+    SeedEmbedding::create([
+        'seed_type' => 'album',
+        'seed_id' => $this->album->id,
+        'embedding' => [0.0, 1.0],
+        'track_count' => 1,
+    ]);
+
+    $recs = neighbourTestService()->recommend(RecommendationContext::fromArray([
+        'seed_type' => 'album',
+        'seed_id' => $this->album->id,
+        'exclude' => [$seed->id],
+        'limit' => 2,
+    ]));
+
+    expect($recs)->toHaveCount(2);
+    expect($recs->first()->id)->toBe($candidateB->id);
+});
+
+it('ranks track seeds with stored neighbour scores', function () {
+    $seed = neighbourTestTrack('seed-1', $this->artist, $this->album);
+    $neighbour = neighbourTestTrack('cand-neighbour', $this->artist, $this->otherAlbum);
+    $other = neighbourTestTrack('cand-other', $this->artist, $this->otherAlbum);
+
+    TrackEmbedding::create(['track_id' => $seed->id, 'embedding' => [1.0, 0.0]]);
+    TrackEmbedding::create(['track_id' => $other->id, 'embedding' => [0.0, 1.0]]);
+
+    // No embedding row for the neighbour: its score comes from track_neighbors alone.
+    TrackNeighbor::create([
+        'track_id' => $seed->id,
+        'rank' => 1,
+        'neighbor_id' => $neighbour->id,
+        'score' => 0.95,
+    ]);
+
+    $recs = neighbourTestService()->recommend(RecommendationContext::fromArray([
+        'seed_type' => 'track',
+        'seed_id' => $seed->id,
+        'limit' => 2,
+    ]));
+
+    expect($recs)->toHaveCount(2);
+    expect($recs->first()->id)->toBe($neighbour->id);
+});
+
+it('refuses to update or delete precomputed rows through Eloquent', function () {
+    $seed = neighbourTestTrack('seed-1', $this->artist, $this->album);
+    $neighbour = neighbourTestTrack('cand-neighbour', $this->artist, $this->otherAlbum);
+
+    $row = TrackNeighbor::create([
+        'track_id' => $seed->id,
+        'rank' => 1,
+        'neighbor_id' => $neighbour->id,
+        'score' => 0.95,
+    ]);
+
+    expect(fn () => $row->update(['score' => 0.5]))->toThrow(LogicException::class);
+    expect(fn () => $row->delete())->toThrow(LogicException::class);
+    expect(TrackNeighbor::where('track_id', $seed->id)->value('score'))->toBe(0.95);
+});
@@ -0,0 +1,38 @@
+<?php
+
+use App\Models\TrackEmbedding;
+
+// Fixtures produced by scrapers/compute_embeddings.py encode_embedding([0.5, -1.25, 3.0], ...).
+test('decodes float32 embedding blobs', function () {
+    $blob = hex2bin('010103000000003f0000a0bf00004040');
+
+    expect(TrackEmbedding::decodeBlob($blob))->toBe([0.5, -1.25, 3.0]);
+});
+
+test('decodes float16 embedding blobs', function () {
+    $blob = hex2bin('01020300003800bd0042');
+
+    expect(TrackEmbedding::decodeBlob($blob))->toBe([0.5, -1.25, 3.0]);
+});
+
+test('rejects unknown blob versions', function () {
+    expect(TrackEmbedding::decodeBlob(hex2bin('020103000000003f0000a0bf00004040')))->toBeNull();
+});
+
+test('prefers the blob over the json column', function () {
+    $embedding = (new TrackEmbedding)->setRawAttributes([
+        'embedding' => '[9.0, 9.0, 9.0]',
+        'embedding_blob' => hex2bin('010103000000003f0000a0bf00004040'),
+    ]);
+
+    expect($embedding->embedding)->toBe([0.5, -1.25, 3.0]);
+});
+
+test('falls back to the json column without a blob', function () {
+    $embedding = (new TrackEmbedding)->setRawAttributes([
+        'embedding' => '[1.0, 0.0]',
+        'embedding_blob' => null,
+    ]);
+
+    expect($embedding->embedding)->toBe([1.0, 0.0]);
+});